@@ -1,25 +1,42 @@
 import streamlit as st
-import os
-from main_places_api import GooglePlacesBusinessChecker
+from collections import deque
+import requests
+from job_client import JobError, ensure_server
 import time
 
+# Analyses are submitted to the local job server (see job_server.py), which queues them and
+# shares caches and the Gemini rate limit between every session. The page polls its job every
+# RENDER_INTERVAL seconds until it ends, showing at most LOG_LINES_SHOWN log lines.
+RENDER_INTERVAL = 0.5
+LOG_LINES_SHOWN = 100
+ACTIVE_JOB_STATUSES = ("queued", "running", "cancelling")
+
 st.set_page_config(page_title="No Site Business Finder - NSBF", layout="centered")
 
+@st.cache_resource(show_spinner=False)
+def get_client():
+    # One job client per Streamlit process; starts the job server here if none is running yet
+    return ensure_server()
+
 # --- Sidebar: API Key Management ---
+# Keys set here stay in this browser session and are sent with each job; without them the job
+# server uses the keys from its own environment or .env file
+session_keys = st.session_state.setdefault("api_keys", {})
+server_keys = (get_client().health() or {}).get("keys", {})
 st.sidebar.header("🔑 API Key Management")
 with st.sidebar:
-    gemini_key = os.environ.get("GEMINI_API_KEY")
-    places_key = os.environ.get("GOOGLE_PLACES_API_KEY")
+    gemini_key = session_keys.get("gemini") or server_keys.get("gemini")
+    places_key = session_keys.get("places") or server_keys.get("places")
     st.markdown(f'''Gemini API Key: {'✅ <span style="color:#228B22">Found</span>' if gemini_key else '❌ <span style="color:#B22222">Not Found</span>'}''', unsafe_allow_html=True)
     st.markdown(f'''Places API Key: {'✅ <span style="color:#228B22">Found</span>' if places_key else '❌ <span style="color:#B22222">Not Found</span>'}''', unsafe_allow_html=True)
     st.markdown("---")
-    new_gemini = st.text_input("Set Gemini API Key (session only)", value="" if gemini_key else "", type="password", key="set_gemini")
-    new_places = st.text_input("Set Places API Key (session only)", value="" if places_key else "", type="password", key="set_places")
+    new_gemini = st.text_input("Set Gemini API Key (session only)", value="", type="password", key="set_gemini")
+    new_places = st.text_input("Set Places API Key (session only)", value="", type="password", key="set_places")
     if st.button("Set API Keys for Session", use_container_width=True):
         if new_gemini:
-            os.environ["GEMINI_API_KEY"] = new_gemini
+            session_keys["gemini"] = new_gemini
         if new_places:
-            os.environ["GOOGLE_PLACES_API_KEY"] = new_places
+            session_keys["places"] = new_places
         st.success("API keys set for this session!")
         st.experimental_rerun()
 
@@ -53,10 +70,11 @@ with st.container():
         col1, col2 = st.columns([1, 1])
         with col1:
             location = st.text_input("📍 Location", value="Nugegoda, Sri Lanka")
+            tiled = st.checkbox("🧩 Tiled sweep (whole area, past the 60-result limit)", value=False)
             
 
         with col2:
-            max_results = st.number_input("🔢 Number of Businesses to Analyse", min_value=1, max_value=100, value=50)
+            max_results = st.number_input("🔢 Number of Businesses to Analyse", min_value=1, max_value=1000, value=50)
             batch_size = st.number_input("📦 Batch Size to Analyse AI", min_value=1, max_value=50, value=10)
             
         st.markdown("<div style='margin-bottom: 0.5em'></div>", unsafe_allow_html=True)
@@ -83,13 +101,14 @@ with st.container():
 
 
 # --- Logging and Progress ---
-log_area = st.container()
+log_area = st.empty()
 progress_bar = st.empty()
 notification_area = st.empty()
+results_area = st.empty()
 
 output_files = [
-    ("places_businesses_without_websites.txt", "Text Output (.txt)"),
-    ("places_businesses_without_websites.csv", "CSV Output (.csv)")
+    ("txt", "Text Output (.txt)"),
+    ("csv", "CSV Output (.csv)")
 ]
 
 # Helper for colored log lines
@@ -113,54 +132,88 @@ def format_log_line(line):
         return f'<span style="color:#2d5be3">🎉 {line}</span>'
     return f'<span style="color:#f4f6fb">{line}</span>'
 
-if submitted:
-    gemini_key = os.environ.get("GEMINI_API_KEY")
-    places_key = os.environ.get("GOOGLE_PLACES_API_KEY")
+def start_run(client, location, max_results, batch_size, tiled, api_keys):
+    job = client.submit(location, max_results=max_results, batch_size=batch_size, tiled=tiled, api_keys=api_keys)
+    return {"job_id": job["job_id"], "log_lines": deque(maxlen=LOG_LINES_SHOWN), "log_offset": 0,
+            "results": [], "result_pos": 0, "job": job, "finished": False}
+
+def poll_run(client, run):
+    # Pulls the job's status plus only the log lines and result rows added since the last poll
+    job_id = run["job_id"]
+    run["job"] = client.job(job_id)
+    lines, run["log_offset"] = client.log(job_id, run["log_offset"])
+    run["log_lines"].extend(lines)
+    rows, run["result_pos"] = client.results(job_id, run["result_pos"])
+    run["results"].extend({"name": row["name"], "maps_url": row["maps_url"], "reason": row["reason"]}
+                          for row in rows if row["status"] == "NO_WEBSITE")
+    run["finished"] = run["job"]["status"] not in ACTIVE_JOB_STATUSES
+
+def render_run(client, run):
+    try:
+        poll_run(client, run)
+    except (JobError, requests.RequestException) as e:
+        run["finished"] = True
+        notification_area.error(f"❌ Lost contact with the job server: {e}")
+        return
+    job = run["job"]
+    formatted = [format_log_line(line) for line in run["log_lines"]]
+    log_html = f'<div id="log-box" class="code-log">' + '<br>'.join(formatted) + '</div>'
+    log_area.markdown(log_html, unsafe_allow_html=True)
+    if run["results"]:
+        results_area.dataframe(run["results"], use_container_width=True, hide_index=True)
+    if not run["finished"]:
+        progress_bar.progress(job["progress"]["fraction"], text=job["progress"]["label"])
+        if job["status"] == "queued":
+            notification_area.info("⏳ Waiting for a free worker on the job server...")
+        else:
+            notification_area.info(f"⏳ Analysis running... {len(run['results'])} businesses without websites so far")
+        return
+    summary = job["summary"] or {}
+    if job["status"] == "failed":
+        notification_area.error(f"❌ Error: {job['error']}")
+        return
+    if job["status"] == "incomplete":
+        notification_area.warning(f"⚠️ Analysis incomplete: {job['error']}. {summary.get('no_website', 0)} businesses without websites found; results so far are below.")
+    elif job["status"] == "cancelled":
+        notification_area.warning(f"⚠️ Analysis cancelled. {summary.get('no_website', 0)} businesses without websites found before it stopped.")
+    else:
+        notification_area.success(f"✅ Analysis complete! {summary.get('no_website', 0)} of {summary.get('analyzed', 0)} businesses have no website. Download your results below.")
+    with st.expander("⬇️ Download Results"):
+        for fmt, label in output_files:
+            try:
+                data = client.download(run["job_id"], fmt)
+            except (JobError, requests.RequestException):
+                continue
+            st.download_button(label=label, data=data, file_name=f"nsbf-{run['job_id']}.{fmt}")
+
+run = st.session_state.get("run")
+running = run is not None and not run["finished"]
+if submitted and running:
+    st.toast("⚠️ An analysis is already running. Wait for it to finish.")
+elif submitted:
     if not gemini_key:
-        notification_area.error("❌ ERROR: GEMINI_API_KEY is not set in environment or .env file.")
+        notification_area.error("❌ ERROR: GEMINI_API_KEY is not set for this session or in the job server's environment/.env file.")
     elif not places_key:
-        notification_area.error("❌ ERROR: GOOGLE_PLACES_API_KEY is not set in environment or .env file.")
+        notification_area.error("❌ ERROR: GOOGLE_PLACES_API_KEY is not set for this session or in the job server's environment/.env file.")
     else:
-        checker = GooglePlacesBusinessChecker()
-        import builtins
-        orig_print = print
-        log_lines = []
-        def print_to_log(*args, **kwargs):
-            msg = ' '.join(str(a) for a in args)
-            log_lines.append(msg)
-            # Format log lines with color and emoji
-            formatted = [format_log_line(line) for line in log_lines[-100:]]
-            log_html = f'<div id="log-box" class="code-log">' + '<br>'.join(formatted) + '</div>'
-            log_area.markdown(log_html, unsafe_allow_html=True)
-            orig_print(*args, **kwargs)
-        builtins.print = print_to_log
         try:
-            notification_area.info("⏳ Analysis started! Please wait...")
-            for i in range(5):
-                progress_bar.progress((i+1)/5, text=f"Preparing... {20*(i+1)}%")
-                time.sleep(0.2)
-            progress_bar.progress(0, text="Running analysis...")
-            checker.run_search(location, max_results=int(max_results), batch_size=int(batch_size))
-            progress_bar.progress(1.0, text="Analysis complete!")
-            notification_area.success("✅ Analysis complete! Download your results below.")
-            log_lines.append("success Analysis complete!")
-            log_lines.append("Results saved to places_businesses_without_websites.txt and .csv")
-            formatted = [format_log_line(line) for line in log_lines[-100:]]
-            log_html = f'<div id="log-box" class="code-log">' + '<br>'.join(formatted) + '</div>'
-            log_area.markdown(log_html, unsafe_allow_html=True)
-            with st.expander("⬇️ Download Results"):
-                for fname, label in output_files:
-                    if os.path.exists(fname):
-                        with open(fname, "rb") as f:
-                            st.download_button(label=label, data=f, file_name=fname)
-        except Exception as e:
-            notification_area.error(f"❌ Error: {e}")
-        finally:
-            builtins.print = orig_print
-            progress_bar.empty()
+            run = start_run(get_client(), location, int(max_results), int(batch_size), tiled, session_keys or None)
+        except (JobError, requests.RequestException) as e:
+            notification_area.error(f"❌ Could not submit the analysis: {e}")
+        else:
+            st.session_state["run"] = run
+            running = True
+if run is not None and (running or not submitted):
+    render_run(get_client(), run)
+    running = not run["finished"]
 
 # --- Footer ---
 st.markdown(
     '<div class="footer">Made with ❤️ by <a href="https://geethikaisuru.com" class="footer-link" target="_blank">Geethika</a></div>',
     unsafe_allow_html=True
-) 
\ No newline at end of file
+) 
+
+# Poll the background run: sleep briefly, then rerun the script to draw the next snapshot
+if running:
+    time.sleep(RENDER_INTERVAL)
+    (getattr(st, "rerun", None) or st.experimental_rerun)()
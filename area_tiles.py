@@ -0,0 +1,64 @@
+import math
+
+# Geometry helpers for tiled Nearby Search sweeps. A tile is a (lat, lng, radius_m) circle;
+# circles of radius r centred on a grid with spacing r * sqrt(2) cover the whole viewport.
+
+METERS_PER_DEGREE_LAT = 111320.0
+
+
+def _meters_per_degree_lng(lat):
+    return METERS_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 1e-6)
+
+
+def viewport_from_geocode(geocode_result, fallback_radius=5000):
+    # (south, west, north, east) for a Geocoding result, falling back to a square around its point
+    geometry = geocode_result.get('geometry', {})
+    viewport = geometry.get('viewport') or geometry.get('bounds')
+    if viewport:
+        sw, ne = viewport['southwest'], viewport['northeast']
+        return sw['lat'], sw['lng'], ne['lat'], ne['lng']
+    lat, lng = geometry['location']['lat'], geometry['location']['lng']
+    dlat = fallback_radius / METERS_PER_DEGREE_LAT
+    dlng = fallback_radius / _meters_per_degree_lng(lat)
+    return lat - dlat, lng - dlng, lat + dlat, lng + dlng
+
+
+def grid_tiles(viewport, tile_radius=2000, max_tiles=64):
+    # Covering circles for the viewport; the radius grows if the grid would exceed max_tiles
+    south, west, north, east = viewport
+    mid_lat = (south + north) / 2
+    height = max((north - south) * METERS_PER_DEGREE_LAT, 1.0)
+    width = max((east - west) * _meters_per_degree_lng(mid_lat), 1.0)
+    radius = float(tile_radius)
+    while True:
+        step = radius * math.sqrt(2)
+        rows = max(1, math.ceil(height / step))
+        cols = max(1, math.ceil(width / step))
+        if rows * cols <= max_tiles:
+            break
+        radius *= 1.25
+    # Square cells of side `step`, centred on the viewport; each circle covers its cell exactly
+    center_lat = mid_lat
+    center_lng = (west + east) / 2
+    tiles = []
+    for row in range(rows):
+        lat = center_lat + (row - (rows - 1) / 2) * step / METERS_PER_DEGREE_LAT
+        for col in range(cols):
+            lng = center_lng + (col - (cols - 1) / 2) * step / _meters_per_degree_lng(mid_lat)
+            tiles.append((lat, lng, radius))
+    return tiles
+
+
+def subdivide_tile(tile):
+    # Four circles covering the square inscribed in tile, each with half its radius
+    lat, lng, radius = tile
+    offset = radius / (2 * math.sqrt(2))
+    dlat = offset / METERS_PER_DEGREE_LAT
+    dlng = offset / _meters_per_degree_lng(lat)
+    half = radius / 2
+    return [
+        (lat - dlat, lng - dlng, half),
+        (lat - dlat, lng + dlng, half),
+        (lat + dlat, lng - dlng, half),
+        (lat + dlat, lng + dlng, half),
+    ]
@@ -0,0 +1,233 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.managers import BaseManager
+
+from rate_limiter import RateLimiter
+from result_sinks import JsonlSink
+
+# Runs many (location, business_type) sweeps across a pool of worker processes.
+#
+#   python batch_runner.py locations.csv --workers 4 --max-results 100 --tiled
+#
+# The input file has one sweep per line: "location[,business_type]" (a header row
+# "location,business_type" and lines starting with # are ignored). All workers share one
+# Gemini rate limiter and one place_id registry hosted by a manager process, so the global
+# quota is respected and a place found from several locations is only analysed once.
+# A sweep that fails or leaves places unanswered or without details releases the places it claimed but never
+# finished, so other sweeps can take them, and is retried once (resuming its journal).
+# Output: <out-dir>/batch_results.csv and .jsonl (merged) plus batch_summary.csv.
+
+DEFAULT_OUT_DIR = "batch_output"
+
+
+class PlaceRegistry:
+    # place_id -> first location that claimed it, shared by every worker through the manager
+    def __init__(self):
+        self._owners = {}
+
+    def claim(self, place_ids, owner):
+        # The ids that are free or already owner's (a resumed sweep filters its places again)
+        claimed = []
+        for place_id in place_ids:
+            if self._owners.setdefault(place_id, owner) == owner:
+                claimed.append(place_id)
+        return claimed
+
+    def release(self, owner, keep=()):
+        # Frees owner's claims except the place_ids in keep; returns how many were freed
+        keep = set(keep)
+        released = [p for p, o in self._owners.items() if o == owner and p not in keep]
+        for place_id in released:
+            del self._owners[place_id]
+        return len(released)
+
+    def size(self):
+        return len(self._owners)
+
+
+class BatchManager(BaseManager):
+    pass
+
+
+BatchManager.register("RateLimiter", RateLimiter)
+BatchManager.register("PlaceRegistry", PlaceRegistry)
+
+
+def load_jobs(path, default_business_type=""):
+    jobs = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if not row or not row[0].strip() or row[0].lstrip().startswith('#'):
+                continue
+            location = row[0].strip()
+            business_type = row[1].strip() if len(row) > 1 and row[1].strip() else default_business_type
+            if location.lower() == 'location' and business_type.lower() in ('business_type', 'type'):
+                continue
+            jobs.append({'location': location, 'business_type': business_type})
+    return jobs
+
+
+_worker = {}
+
+
+def _init_worker(rate_limiter, registry, checker_kwargs):
+    from main_places_api import GooglePlacesBusinessChecker
+    _worker['checker'] = GooglePlacesBusinessChecker(rate_limiter=rate_limiter, **checker_kwargs)
+    _worker['registry'] = registry
+
+
+def _incomplete(summary):
+    return bool(summary['error'] or summary.get('unanswered') or summary.get('details_failed'))
+
+
+def _problem(summary):
+    if summary['error']:
+        return f"error: {summary['error']}"
+    return f"{summary.get('unanswered', 0)} unanswered, {summary.get('details_failed', 0)} without details"
+
+
+def _run_job(index, job, part_path, max_results, batch_size, tiled, include_has_website, delta=False, resume=None):
+    from run_journal import RunJournal
+    checker = _worker['checker']
+    registry = _worker['registry']
+    owner = f"{job['location']}|{job['business_type']}"
+
+    def claim_new(businesses):
+        claimed = set(registry.claim([b['place_id'] for b in businesses], owner))
+        return [b for b in businesses if b['place_id'] in claimed]
+
+    started = time.time()
+    sink = JsonlSink(part_path, include_has_website=include_has_website, append=bool(resume))
+    summary = {'index': index, 'location': job['location'], 'business_type': job['business_type'], 'error': ''}
+    checker.last_run_id = None
+    try:
+        result = checker.run_search(job['location'], job['business_type'], max_results=max_results,
+                                    batch_size=batch_size, tiled=tiled, sinks=[sink], collect_results=False,
+                                    place_filter=claim_new, delta=delta, resume=resume)
+        summary.update(result or {})
+    except Exception as e:
+        summary['error'] = str(e) or type(e).__name__
+        summary['run_id'] = checker.last_run_id
+    if _incomplete(summary):
+        # Keep only the places whose results reached the part file
+        committed = ()
+        if summary.get('run_id'):
+            journal = RunJournal.open(summary['run_id'])
+            try:
+                committed = list(journal.classified_ids())
+            finally:
+                journal.close()
+        summary['released'] = registry.release(owner, committed)
+    summary['seconds'] = round(time.time() - started, 1)
+    summary['part_path'] = part_path
+    return summary
+
+
+def _merge_results(summaries, out_dir):
+    results_csv = os.path.join(out_dir, "batch_results.csv")
+    results_jsonl = os.path.join(out_dir, "batch_results.jsonl")
+    with open(results_csv, 'w', newline='', encoding='utf-8') as csv_file, \
+            open(results_jsonl, 'w', encoding='utf-8') as jsonl_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(['Location', 'Business Type', 'Business Name', 'Google Maps URL', 'Status', 'AI Analysis'])
+        for summary in sorted(summaries, key=lambda s: s['index']):
+            if not os.path.exists(summary['part_path']):
+                continue
+            with open(summary['part_path'], encoding='utf-8') as part:
+                for line in part:
+                    if not line.strip():
+                        continue
+                    row = json.loads(line)
+                    row['location'] = summary['location']
+                    row['business_type'] = summary['business_type']
+                    writer.writerow([summary['location'], summary['business_type'], row['name'],
+                                     row['maps_url'], row['status'], row['reason']])
+                    jsonl_file.write(json.dumps(row, ensure_ascii=False) + "\n")
+    summary_csv = os.path.join(out_dir, "batch_summary.csv")
+    columns = ['location', 'business_type', 'found', 'skipped', 'analyzed', 'decided_locally',
+               'ai_batches', 'no_website', 'unanswered', 'details_failed', 'added', 'changed', 'removed', 'seconds', 'run_id', 'error']
+    with open(summary_csv, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for summary in sorted(summaries, key=lambda s: s['index']):
+            writer.writerow([summary.get(c, '') for c in columns])
+    return results_csv, results_jsonl, summary_csv
+
+
+def run_batch(jobs, workers=4, out_dir=DEFAULT_OUT_DIR, max_results=50, batch_size=10, tiled=False,
+              include_has_website=False, gemini_rpm=None, gemini_tpm=None, checker_kwargs=None, delta=False):
+    # Returns the per-location summaries (in input order) after writing the merged outputs
+    from main_places_api import GEMINI_REQUESTS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE
+    parts_dir = os.path.join(out_dir, "parts")
+    os.makedirs(parts_dir, exist_ok=True)
+    checker_kwargs = dict(checker_kwargs or {})
+    summaries = []
+    with BatchManager() as manager:
+        rate_limiter = manager.RateLimiter(gemini_rpm or GEMINI_REQUESTS_PER_MINUTE, gemini_tpm or GEMINI_TOKENS_PER_MINUTE)
+        registry = manager.PlaceRegistry()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(rate_limiter, registry, checker_kwargs)) as executor:
+            futures = {}
+            for index, job in enumerate(jobs):
+                part_path = os.path.join(parts_dir, f"{index:04d}.jsonl")
+                futures[executor.submit(_run_job, index, job, part_path, max_results, batch_size,
+                                        tiled, include_has_website, delta)] = False
+            while futures:
+                future = next(as_completed(futures))
+                retried = futures.pop(future)
+                summary = future.result()
+                if _incomplete(summary) and not retried:
+                    print(f"[BATCH] Retrying {summary['location']} ({summary['business_type'] or 'all'}): "
+                          f"{_problem(summary)}")
+                    futures[executor.submit(_run_job, summary['index'], jobs[summary['index']], summary['part_path'],
+                                            max_results, batch_size, tiled, include_has_website, delta,
+                                            summary.get('run_id'))] = True
+                    continue
+                summaries.append(summary)
+                if summary['error']:
+                    status = _problem(summary)
+                elif _incomplete(summary):
+                    status = f"{summary.get('no_website', 0)} without websites, {_problem(summary)}"
+                else:
+                    status = f"{summary.get('no_website', 0)} without websites"
+                print(f"[BATCH] {len(summaries)}/{len(jobs)} done: {summary['location']} ({summary['business_type'] or 'all'}) - {status}")
+        unique = registry.size()
+    results_csv, results_jsonl, summary_csv = _merge_results(summaries, out_dir)
+    print(f"[BATCH] {unique} unique places across {len(jobs)} sweeps")
+    print(f"[BATCH] Merged results: {results_csv}, {results_jsonl}")
+    print(f"[BATCH] Per-location summary: {summary_csv}")
+    return sorted(summaries, key=lambda s: s['index'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run website checks for many locations across worker processes.")
+    parser.add_argument("jobs_file", help="CSV/text file with one 'location[,business_type]' per line")
+    parser.add_argument("--business-type", default="", help="Business type for lines that do not give one")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--out-dir", default=DEFAULT_OUT_DIR)
+    parser.add_argument("--max-results", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--tiled", action="store_true", help="Use tiled area sweeps")
+    parser.add_argument("--include-has-website", action="store_true")
+    parser.add_argument("--delta", action="store_true", help="Only analyse places that are new or changed since the last sweep")
+    parser.add_argument("--gemini-rpm", type=int, default=None, help="Global Gemini requests/minute across all workers")
+    parser.add_argument("--gemini-tpm", type=int, default=None, help="Global Gemini tokens/minute across all workers")
+    args = parser.parse_args(argv)
+
+    jobs = load_jobs(args.jobs_file, args.business_type)
+    if not jobs:
+        print(f"No locations found in {args.jobs_file}")
+        return 1
+    summaries = run_batch(jobs, workers=args.workers, out_dir=args.out_dir, max_results=args.max_results,
+                          batch_size=args.batch_size, tiled=args.tiled, include_has_website=args.include_has_website,
+                          gemini_rpm=args.gemini_rpm, gemini_tpm=args.gemini_tpm, delta=args.delta)
+    return 1 if any(_incomplete(s) for s in summaries) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
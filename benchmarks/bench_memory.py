@@ -0,0 +1,107 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+# Peak-RSS benchmark of run_search's list mode (the default) against stream=True, using the
+# local fake endpoints. Each mode runs in its own child process so the peaks are independent;
+# the fake servers run in this process.
+#
+#   python benchmarks/bench_memory.py --places 20000 --max-results 20000
+#   python benchmarks/bench_memory.py --places 5000 --details-padding 2000 --json mem.json
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_servers import FakeConfig, FakeServers  # noqa: E402
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_child(args):
+    os.environ.setdefault("GOOGLE_PLACES_API_KEY", "bench")
+    os.environ.setdefault("GEMINI_API_KEY", "bench")
+    from main_places_api import GooglePlacesBusinessChecker
+    from result_sinks import JsonlSink
+    checker = GooglePlacesBusinessChecker(
+        cache_path=None,
+        places_base_url=args.places_base_url,
+        gemini_base_url=args.gemini_base_url,
+        page_token_delay=0.0,
+        gemini_rpm=10 ** 6,
+        gemini_tpm=10 ** 9,
+        log_to_console=False,
+    )
+    # Warm up imports, connection pools and the Gemini client so only the run itself is measured
+    checker.get_business_detailed_info({'name': '', 'place_id': 'fake-0', 'maps_url': ''})
+    checker.classify_businesses_with_gemini([checker.get_business_detailed_info({'name': '', 'place_id': 'fake-2', 'maps_url': ''})])
+    baseline = _peak_rss_mb()
+    stream = args.child == "stream"
+    with tempfile.TemporaryDirectory() as out_dir:
+        started = time.perf_counter()
+        summary = checker.run_search("Benchmark Town", max_results=args.max_results, batch_size=args.batch_size,
+                                     tiled=True, sinks=[JsonlSink(os.path.join(out_dir, "results.jsonl"))],
+                                     journal=args.journal, run_dir=out_dir, stream=stream,
+                                     collect_results=not stream)
+        seconds = time.perf_counter() - started
+    print(json.dumps({
+        "mode": args.child,
+        "found": summary['found'],
+        "analyzed": summary['analyzed'],
+        "seconds": round(seconds, 2),
+        "baseline_rss_mb": round(baseline, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare peak RSS of list and streaming runs against fake endpoints.")
+    parser.add_argument("--places", type=int, default=20000, help="Places in the fake world")
+    parser.add_argument("--max-results", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--details-padding", type=int, default=0, help="Extra bytes in each details response")
+    parser.add_argument("--journal", action="store_true", help="Journal the runs (off by default)")
+    parser.add_argument("--json", help="Also write the report to this JSON file")
+    parser.add_argument("--child", choices=("list", "stream"), help=argparse.SUPPRESS)
+    parser.add_argument("--places-base-url", help=argparse.SUPPRESS)
+    parser.add_argument("--gemini-base-url", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        return run_child(args)
+
+    config = FakeConfig(places=args.places, latency_ms=0.0, jitter_ms=0.0, gemini_latency_ms=0.0,
+                        gemini_chunk_ms=0.0, gemini_chunk_chars=4096, details_padding=args.details_padding)
+    rows = []
+    with FakeServers(config) as servers:
+        for mode in ("list", "stream"):
+            command = [sys.executable, os.path.abspath(__file__), "--child", mode,
+                       "--places-base-url", servers.places_base_url, "--gemini-base-url", servers.gemini_base_url,
+                       "--max-results", str(args.max_results), "--batch-size", str(args.batch_size)]
+            if args.journal:
+                command.append("--journal")
+            output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+            rows.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'mode':<8}{'found':>8}{'analyzed':>10}{'seconds':>9}{'base MB':>9}{'peak MB':>9}{'run MB':>9}")
+    for row in rows:
+        row["run_rss_mb"] = round(row["peak_rss_mb"] - row["baseline_rss_mb"], 1)
+        print(f"{row['mode']:<8}{row['found']:>8}{row['analyzed']:>10}{row['seconds']:>9}"
+              f"{row['baseline_rss_mb']:>9}{row['peak_rss_mb']:>9}{row['run_rss_mb']:>9}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "runs": rows}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# End-to-end benchmark of GooglePlacesBusinessChecker against the local fake endpoints in
+# benchmarks/fake_servers.py. No API keys or network access are needed. Reports throughput
+# and p50/p95 latency for search, details, classification and the full run_search.
+#
+#   python benchmarks/bench_pipeline.py --places 500 --max-results 200 --runs 3
+#   python benchmarks/bench_pipeline.py --latency-ms 80 --error-rate 0.02 --json bench.json
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_servers import FakeConfig, FakeServers  # noqa: E402
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+class StageTimer:
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.items = 0
+        self.wall = 0.0
+
+    def report(self):
+        return {
+            "stage": self.name,
+            "calls": len(self.latencies),
+            "items": self.items,
+            "wall_s": round(self.wall, 3),
+            "throughput_per_s": round(self.items / self.wall, 1) if self.wall else 0.0,
+            "p50_ms": round(percentile(self.latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(self.latencies, 95) * 1000, 1),
+        }
+
+
+def _timed(timer, fn):
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            timer.latencies.append(time.perf_counter() - started)
+    return wrapper
+
+
+@contextlib.contextmanager
+def _quiet(enabled):
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def make_checker(servers, args):
+    os.environ.setdefault("GOOGLE_PLACES_API_KEY", "bench")
+    os.environ.setdefault("GEMINI_API_KEY", "bench")
+    from main_places_api import GooglePlacesBusinessChecker
+    return GooglePlacesBusinessChecker(
+        cache_path=None,
+        details_workers=args.details_workers,
+        classify_workers=args.classify_workers,
+        places_base_url=servers.places_base_url,
+        gemini_base_url=servers.gemini_base_url,
+        page_token_delay=args.page_token_delay,
+        gemini_rpm=100000,
+        gemini_tpm=10 ** 9,
+    )
+
+
+def bench_search(servers, args):
+    timer = StageTimer("search")
+    checker = make_checker(servers, args)
+    checker.search_businesses_in_area = _timed(timer, checker.search_businesses_in_area)
+    started = time.perf_counter()
+    businesses = []
+    for _ in range(args.runs):
+        businesses = checker.search_businesses_in_area("Benchmark Town", "", args.max_results)
+        timer.items += len(businesses)
+    timer.wall = time.perf_counter() - started
+    return timer, businesses
+
+
+def bench_details(servers, args, businesses):
+    timer = StageTimer("details")
+    checker = make_checker(servers, args)
+    checker._fetch_place_details = _timed(timer, checker._fetch_place_details)
+    started = time.perf_counter()
+    records = []
+    for _ in range(args.runs):
+        records = checker.fetch_business_details(businesses)
+        timer.items += len(records)
+    timer.wall = time.perf_counter() - started
+    return timer, records
+
+
+def bench_classification(servers, args, records):
+    timer = StageTimer("classification")
+    checker = make_checker(servers, args)
+    ambiguous = [r for r in records if checker.preclassify(r) is None] or records
+    batches = [ambiguous[i:i + args.batch_size] for i in range(0, len(ambiguous), args.batch_size)]
+    classify = _timed(timer, checker.classify_businesses_with_gemini)
+    started = time.perf_counter()
+    for _ in range(args.runs):
+        with ThreadPoolExecutor(max_workers=args.classify_workers) as pool:
+            for classifications in pool.map(classify, batches):
+                timer.items += len(classifications)
+    timer.wall = time.perf_counter() - started
+    return timer
+
+
+def bench_run_search(servers, args):
+    timer = StageTimer("run_search")
+    checker = make_checker(servers, args)
+    started = time.perf_counter()
+    for _ in range(args.runs):
+        run_started = time.perf_counter()
+        summary = checker.run_search("Benchmark Town", max_results=args.max_results, batch_size=args.batch_size,
+                                     tiled=args.tiled, sinks=[], journal=False, collect_results=False)
+        timer.latencies.append(time.perf_counter() - run_started)
+        timer.items += summary['analyzed']
+    timer.wall = time.perf_counter() - started
+    return timer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the checker against local fake endpoints.")
+    parser.add_argument("--places", type=int, default=500, help="Places in the fake world")
+    parser.add_argument("--max-results", type=int, default=60)
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--tiled", action="store_true")
+    parser.add_argument("--details-workers", type=int, default=8)
+    parser.add_argument("--classify-workers", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    parser.add_argument("--gemini-latency-ms", type=float, default=300.0)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--page-token-delay", type=float, default=0.0, help="Seconds to wait before next_page_token requests")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--details-padding", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--verbose", action="store_true", help="Show the checker's own log output")
+    parser.add_argument("--json", help="Also write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    config = FakeConfig(places=args.places, seed=args.seed, latency_ms=args.latency_ms,
+                        gemini_latency_ms=args.gemini_latency_ms, page_size=args.page_size,
+                        error_rate=args.error_rate, details_padding=args.details_padding)
+    with FakeServers(config) as servers, _quiet(not args.verbose):
+        search, businesses = bench_search(servers, args)
+        details, records = bench_details(servers, args, businesses)
+        classification = bench_classification(servers, args, records)
+        full = bench_run_search(servers, args)
+        counters = dict(servers.world.counters)
+
+    rows = [t.report() for t in (search, details, classification, full)]
+    print(f"{'stage':<16}{'calls':>7}{'items':>8}{'items/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for row in rows:
+        print(f"{row['stage']:<16}{row['calls']:>7}{row['items']:>8}{row['throughput_per_s']:>10}{row['p50_ms']:>10}{row['p95_ms']:>10}")
+    print(f"fake endpoint calls: {counters}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "stages": rows, "endpoint_calls": counters}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,292 @@
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Local stand-ins for the Geocoding, Nearby Search, Place Details and Gemini
+# streamGenerateContent endpoints. Responses are deterministic for a given seed. Latency,
+# page size, error rate and response size are configurable so the checker can be
+# benchmarked offline.
+#
+#   python benchmarks/fake_servers.py --port 8765 --places 500 --latency-ms 40
+#
+# then point the checker at it:
+#
+#   PLACES_API_BASE_URL=http://127.0.0.1:8765/maps/api GEMINI_API_BASE_URL=http://127.0.0.1:8765/gemini/
+#
+# Place IDs look like "fake-<n>". About a third of places have no website, a third a social
+# or booking link and a third an official site, so every pipeline path is exercised.
+
+SOCIAL_SITES = [
+    "https://www.facebook.com/{slug}",
+    "https://www.instagram.com/{slug}",
+    "https://www.booking.com/hotel/lk/{slug}.html",
+    "https://www.tripadvisor.com/Restaurant_Review-{slug}",
+]
+
+CENTER = (6.8700, 79.8900)
+VIEWPORT_HALF_DEG = 0.03
+
+
+class FakeConfig:
+    def __init__(self, places=500, seed=7, latency_ms=40.0, jitter_ms=10.0, gemini_latency_ms=300.0,
+                 gemini_chunk_ms=5.0, gemini_chunk_chars=80, page_size=20, max_pages=3,
+                 error_rate=0.0, details_padding=0):
+        self.places = places
+        self.seed = seed
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.gemini_latency_ms = gemini_latency_ms
+        self.gemini_chunk_ms = gemini_chunk_ms
+        self.gemini_chunk_chars = gemini_chunk_chars
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.error_rate = error_rate
+        self.details_padding = details_padding
+
+
+class FakeWorld:
+    def __init__(self, config):
+        self.config = config
+        rng = random.Random(config.seed)
+        self.places = []
+        for n in range(config.places):
+            lat = CENTER[0] + rng.uniform(-VIEWPORT_HALF_DEG, VIEWPORT_HALF_DEG)
+            lng = CENTER[1] + rng.uniform(-VIEWPORT_HALF_DEG, VIEWPORT_HALF_DEG)
+            slug = f"business-{n}"
+            kind = n % 3
+            if kind == 0:
+                website = None
+            elif kind == 1:
+                website = SOCIAL_SITES[n % len(SOCIAL_SITES)].format(slug=slug)
+            else:
+                website = f"https://www.{slug}.lk/"
+            self.places.append({
+                "place_id": f"fake-{n}",
+                "name": f"Business {n}",
+                "lat": lat,
+                "lng": lng,
+                "website": website,
+                "phone": f"011 {2000000 + n}",
+                "overview": f"Local business number {n} serving the neighbourhood.",
+            })
+        self.by_id = {p["place_id"]: p for p in self.places}
+        self._rng = random.Random(config.seed + 1)
+        self._lock = threading.Lock()
+        self.counters = {}
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def should_fail(self):
+        if self.config.error_rate <= 0:
+            return False
+        with self._lock:
+            return self._rng.random() < self.config.error_rate
+
+    def sleep(self, base_ms):
+        with self._lock:
+            jitter = self._rng.uniform(-self.config.jitter_ms, self.config.jitter_ms)
+        time.sleep(max(0.0, base_ms + jitter) / 1000.0)
+
+    def nearby(self, lat, lng, radius):
+        m_lat = 111320.0
+        m_lng = 111320.0 * math.cos(math.radians(lat))
+        inside = []
+        for p in self.places:
+            d = math.hypot((p["lat"] - lat) * m_lat, (p["lng"] - lng) * m_lng)
+            if d <= radius:
+                inside.append((d, p))
+        inside.sort(key=lambda item: item[0])
+        return [p for _, p in inside][: self.config.page_size * self.config.max_pages]
+
+
+def _page_token(query, offset):
+    digest = hashlib.sha1(query.encode()).hexdigest()[:12]
+    return f"{digest}:{offset}:{query}"
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    world = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        world = self.world
+        parts = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        world.sleep(world.config.latency_ms)
+        if parts.path.endswith("/geocode/json"):
+            world.count("geocode")
+            return self._send_json({
+                "status": "OK",
+                "results": [{
+                    "formatted_address": query.get("address", ""),
+                    "geometry": {
+                        "location": {"lat": CENTER[0], "lng": CENTER[1]},
+                        "viewport": {
+                            "southwest": {"lat": CENTER[0] - VIEWPORT_HALF_DEG, "lng": CENTER[1] - VIEWPORT_HALF_DEG},
+                            "northeast": {"lat": CENTER[0] + VIEWPORT_HALF_DEG, "lng": CENTER[1] + VIEWPORT_HALF_DEG},
+                        },
+                    },
+                }],
+            })
+        if parts.path.endswith("/place/nearbysearch/json"):
+            world.count("nearbysearch")
+            if "pagetoken" in query:
+                _, offset, search = query["pagetoken"].split(":", 2)
+                offset = int(offset)
+                search = json.loads(search)
+            else:
+                lat, lng = (float(x) for x in query["location"].split(","))
+                search = [lat, lng, float(query.get("radius", 5000))]
+                offset = 0
+            found = world.nearby(*search)
+            page = found[offset:offset + world.config.page_size]
+            payload = {
+                "status": "OK" if found else "ZERO_RESULTS",
+                "results": [{"name": p["name"], "place_id": p["place_id"], "vicinity": "Fake Street"} for p in page],
+            }
+            if offset + world.config.page_size < len(found):
+                payload["next_page_token"] = _page_token(json.dumps(search), offset + world.config.page_size)
+            return self._send_json(payload)
+        if parts.path.endswith("/place/details/json"):
+            world.count("details")
+            if world.should_fail():
+                return self._send_json({"status": "UNKNOWN_ERROR"})
+            place = world.by_id.get(query.get("place_id"))
+            if place is None:
+                return self._send_json({"status": "NOT_FOUND"})
+            fields = set(query.get("fields", "").split(","))
+            result = {"place_id": place["place_id"], "name": place["name"]}
+            if "website" in fields and place["website"]:
+                result["website"] = place["website"]
+            if "formatted_phone_number" in fields:
+                result["formatted_phone_number"] = place["phone"]
+            if "editorial_summary" in fields:
+                result["editorial_summary"] = {"overview": place["overview"]}
+            if "formatted_address" in fields:
+                result["formatted_address"] = "Fake Street, Colombo"
+            if world.config.details_padding:
+                result["reviews"] = [{"text": "x" * world.config.details_padding}]
+            return self._send_json({"status": "OK", "result": result})
+        self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        world = self.world
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if ":streamGenerateContent" not in self.path:
+            return self._send_json({"error": {"code": 404, "message": "not found"}}, status=404)
+        world.count("gemini")
+        world.sleep(world.config.gemini_latency_ms)
+        if world.should_fail():
+            return self._send_json({"error": {"code": 429, "message": "Resource exhausted", "status": "RESOURCE_EXHAUSTED"}}, status=429)
+        prompt = "".join(part.get("text", "") for content in request.get("contents", []) for part in content.get("parts", []))
+        classifications = []
+        for line in prompt.splitlines():
+            if not line.startswith('{"id":'):
+                continue
+            record = json.loads(line)
+            links = record.get("links") or []
+            official = [u for u in links if not any(s in u for s in ("facebook", "instagram", "booking", "tripadvisor"))]
+            status = "HAS_WEBSITE" if official else "NO_WEBSITE"
+            classifications.append({"id": record["id"], "status": status, "reason": "Official site listed." if official else "No official site."})
+        text = json.dumps({"classifications": classifications})
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        step = max(1, world.config.gemini_chunk_chars)
+        for i in range(0, len(text), step):
+            chunk = {"candidates": [{"content": {"role": "model", "parts": [{"text": text[i:i + step]}]}, "index": 0}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\r\n\r\n".encode("utf-8"))
+            self.wfile.flush()
+            if world.config.gemini_chunk_ms:
+                time.sleep(world.config.gemini_chunk_ms / 1000.0)
+        self.close_connection = True
+
+
+class FakeServers:
+    # Runs the fake endpoints on a background thread; use as a context manager
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = config or FakeConfig()
+        self.world = FakeWorld(self.config)
+        handler = type("BoundFakeHandler", (FakeHandler,), {"world": self.world})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def places_base_url(self):
+        return f"{self.base_url}/maps/api"
+
+    @property
+    def gemini_base_url(self):
+        return f"{self.base_url}/gemini/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve fake Google Places and Gemini endpoints.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--places", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    parser.add_argument("--gemini-latency-ms", type=float, default=300.0)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--details-padding", type=int, default=0, help="Extra bytes added to each details response")
+    args = parser.parse_args(argv)
+    config = FakeConfig(places=args.places, seed=args.seed, latency_ms=args.latency_ms,
+                        gemini_latency_ms=args.gemini_latency_ms, page_size=args.page_size,
+                        error_rate=args.error_rate, details_padding=args.details_padding)
+    servers = FakeServers(config, args.host, args.port)
+    print(f"Fake Places API: {servers.places_base_url}")
+    print(f"Fake Gemini API: {servers.gemini_base_url}")
+    try:
+        servers.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servers.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Measures how long `import main_places_api` takes in a fresh interpreter and fails if it
+# exceeds the budget or pulls in modules that are meant to be loaded lazily.
+#
+#   python benchmarks/startup.py --runs 5 --max-ms 400
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAZY_MODULES = ["google.genai"]
+
+PROBE = """
+import json, sys, time
+t = time.perf_counter()
+import main_places_api
+elapsed = time.perf_counter() - t
+print(json.dumps({"ms": elapsed * 1000, "modules": sorted(sys.modules)}))
+"""
+
+
+def measure_import(module_probe=PROBE):
+    out = subprocess.run(
+        [sys.executable, "-c", module_probe],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure main_places_api import time.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=400.0, help="Fail if the median import time exceeds this")
+    args = parser.parse_args(argv)
+
+    timings = []
+    eager = set()
+    for _ in range(args.runs):
+        sample = measure_import()
+        timings.append(sample["ms"])
+        eager.update(m for m in LAZY_MODULES if m in sample["modules"])
+    median = statistics.median(timings)
+    print(f"import main_places_api: median {median:.1f} ms, min {min(timings):.1f} ms, max {max(timings):.1f} ms over {args.runs} runs")
+
+    failed = False
+    if eager:
+        print(f"FAIL: modules that should load lazily were imported at startup: {', '.join(sorted(eager))}")
+        failed = True
+    if median > args.max_ms:
+        print(f"FAIL: median import time {median:.1f} ms exceeds budget of {args.max_ms:.1f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
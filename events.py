@@ -0,0 +1,266 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Structured events and metrics for the checker. Core code calls EventBus.log / stage /
+# timed / count instead of print; subscribers (the console, a UI callback, the logging
+# module, a JSON metrics file) decide what to do with each event.
+#
+# Every event is a dict with "type" and "ts" plus type-specific fields:
+#   log          message, level ("debug" | "info" | "warning" | "error")
+#   stage_start  stage
+#   stage_end    stage, seconds, items
+#   progress     stage, done, total
+#   result       business, classification
+#   run_start    location, business_type, run_id
+#   run_end      summary (None if the run failed), metrics, error
+
+LEVELS = ("debug", "info", "warning", "error")
+
+# Timings keep a uniform random sample (reservoir) of this many durations for percentiles
+_SAMPLE_LIMIT = 2000
+
+
+def level_of(message):
+    # The level implied by the [..][ERROR] / [WARN] / [DEBUG] prefixes used in log lines
+    if "[ERROR]" in message:
+        return "error"
+    if "[WARN]" in message:
+        return "warning"
+    if "[DEBUG]" in message:
+        return "debug"
+    return "info"
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.timings = {}
+            self.stages = {}
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            timing = self.timings.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0, "samples": []})
+            timing["count"] += 1
+            timing["total"] += seconds
+            timing["max"] = max(timing["max"], seconds)
+            samples = timing["samples"]
+            if len(samples) < _SAMPLE_LIMIT:
+                samples.append(seconds)
+            else:
+                # Every duration of the run is equally likely to be in the sample
+                slot = self._random.randrange(timing["count"])
+                if slot < _SAMPLE_LIMIT:
+                    samples[slot] = seconds
+
+    def stage_done(self, name, seconds, items):
+        with self._lock:
+            stage = self.stages.setdefault(name, {"seconds": 0.0, "items": 0})
+            stage["seconds"] += seconds
+            stage["items"] += items
+
+    def snapshot(self):
+        with self._lock:
+            timings = {}
+            for name, t in self.timings.items():
+                samples = sorted(t["samples"])
+                timings[name] = {
+                    "count": t["count"],
+                    "mean_ms": round(t["total"] / t["count"] * 1000, 1),
+                    "p50_ms": round(samples[len(samples) // 2] * 1000, 1),
+                    "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 1),
+                    "max_ms": round(t["max"] * 1000, 1),
+                }
+            return {
+                "counters": dict(self.counters),
+                "timings": timings,
+                "stages": {k: dict(v, seconds=round(v["seconds"], 3)) for k, v in self.stages.items()},
+            }
+
+
+class EventBus:
+    def __init__(self, debug=False):
+        self.debug = debug
+        self.metrics = Metrics()
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        # callback(event) is called on whichever thread emitted the event; returns an unsubscribe function
+        with self._lock:
+            self._subscribers = self._subscribers + [callback]
+
+        def unsubscribe():
+            with self._lock:
+                self._subscribers = [s for s in self._subscribers if s is not callback]
+        return unsubscribe
+
+    def emit(self, type, **fields):
+        event = {"type": type, "ts": time.time()}
+        event.update(fields)
+        for callback in self._subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                logging.getLogger(__name__).warning("Event subscriber failed: %s", e)
+        return event
+
+    def log(self, message, level=None):
+        level = level or level_of(message)
+        if level == "debug" and not self.debug:
+            return
+        self.emit("log", message=message, level=level)
+
+    def count(self, name, value=1):
+        self.metrics.count(name, value)
+
+    def progress(self, stage, done, total=None):
+        self.emit("progress", stage=stage, done=done, total=total)
+
+    @contextmanager
+    def timed(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.metrics.observe(name, time.perf_counter() - started)
+
+    @contextmanager
+    def stage(self, name):
+        # Yields a dict; set its "items" to report how many items the stage handled
+        info = {"items": 0}
+        self.emit("stage_start", stage=name)
+        started = time.perf_counter()
+        try:
+            yield info
+        finally:
+            seconds = time.perf_counter() - started
+            self.metrics.stage_done(name, seconds, info["items"])
+            self.emit("stage_end", stage=name, seconds=round(seconds, 3), items=info["items"])
+
+
+class ConsoleSubscriber:
+    # Prints log messages to stdout, as the checker always has
+    def __call__(self, event):
+        if event["type"] == "log":
+            print(event["message"], flush=True)
+
+
+class LoggingSubscriber:
+    def __init__(self, logger=None):
+        self.logger = logger or logging.getLogger("nsbf")
+
+    def __call__(self, event):
+        if event["type"] == "log":
+            self.logger.log(getattr(logging, event["level"].upper()), event["message"])
+        elif event["type"] == "stage_end":
+            self.logger.info("stage %s finished in %.3fs (%d items)", event["stage"], event["seconds"], event["items"])
+
+
+class JsonMetricsFile:
+    # Writes the run summary and metrics snapshot to a JSON file when a run ends
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, event):
+        if event["type"] != "run_end":
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"summary": event["summary"], "error": event.get("error"), "metrics": event["metrics"]}, f, indent=2)
+
+
+class RunMonitor:
+    # Subscriber that keeps the latest state of a run for a UI polling from another thread:
+    # a bounded ring buffer of log lines, per-stage progress and the no-website results so far
+    # (unless keep_results is False, e.g. when the results are read back from a sink instead)
+    def __init__(self, max_log_lines=500, keep_results=True):
+        self.keep_results = keep_results
+        self._lock = threading.Lock()
+        self.log_lines = deque(maxlen=max_log_lines)
+        self.log_count = 0
+        self.stages = {}
+        self.results = []
+        self.classified = 0
+        self.finished = False
+        self.summary = None
+        self.error = None
+
+    def __call__(self, event):
+        kind = event["type"]
+        with self._lock:
+            if kind == "log":
+                self.log_lines.append(event["message"])
+                self.log_count += 1
+            elif kind == "stage_start":
+                self.stages.setdefault(event["stage"], {"done": 0, "total": None})["running"] = True
+            elif kind == "stage_end":
+                stage = self.stages.setdefault(event["stage"], {"done": 0, "total": None})
+                stage.update(running=False, seconds=event["seconds"])
+            elif kind == "progress":
+                stage = self.stages.setdefault(event["stage"], {"done": 0, "total": None, "running": True})
+                stage.update(done=event["done"], total=event["total"])
+            elif kind == "result":
+                self.classified += 1
+                business, classification = event["business"], event["classification"]
+                if self.keep_results and classification["status"] == "NO_WEBSITE":
+                    self.results.append({
+                        "name": business["name"],
+                        "maps_url": business["maps_url"],
+                        "reason": classification.get("reason", ""),
+                        "source": classification.get("source", "ai"),
+                    })
+            elif kind == "run_end":
+                self.finished = True
+                self.summary = event["summary"]
+                self.error = event["error"]
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "log_lines": list(self.log_lines),
+                "log_count": self.log_count,
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "results": list(self.results),
+                "classified": self.classified,
+                "finished": self.finished,
+                "summary": self.summary,
+                "error": self.error,
+            }
+
+    def log_since(self, offset):
+        # (lines logged after the first `offset` lines that are still buffered, new offset)
+        with self._lock:
+            available = min(len(self.log_lines), max(0, self.log_count - offset))
+            lines = list(self.log_lines)[len(self.log_lines) - available:] if available else []
+            return lines, self.log_count
+
+    def progress(self):
+        # (fraction, label) from the details and classify stage counts
+        with self._lock:
+            details = self.stages.get("details", {})
+            classify = self.stages.get("classify", {})
+            if "search" in self.stages and self.stages["search"].get("running", False):
+                return 0.0, "Searching for businesses..."
+            total = classify.get("total") or details.get("total")
+            if not total:
+                return (1.0, "Done") if self.finished else (0.0, "Starting...")
+            done = details.get("done", 0) + classify.get("done", 0)
+            label = f"Details {details.get('done', 0)}/{total} · Classified {classify.get('done', 0)}/{total}"
+            return min(1.0, done / (2 * total)), label
@@ -0,0 +1,107 @@
+import json
+import os
+import threading
+
+import requests
+
+# Client for job_server.py, used by both front ends. ensure_server() returns a client for a
+# running job server, starting one inside this process when none answers, so a lone user
+# needs no separate server while every UI on the machine still shares one queue.
+
+DEFAULT_SERVER_URL = os.environ.get("NSBF_JOB_SERVER", "http://127.0.0.1:8770")
+REQUEST_TIMEOUT = 10
+
+_embedded_lock = threading.Lock()
+_embedded_server = None
+
+
+class JobError(Exception):
+    pass
+
+
+class JobClient:
+    def __init__(self, base_url=DEFAULT_SERVER_URL, session=None):
+        self.base_url = base_url.rstrip("/")
+        self.session = session or requests.Session()
+
+    def _request(self, method, path, **kwargs):
+        kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+        response = self.session.request(method, self.base_url + path, **kwargs)
+        if response.status_code >= 400:
+            try:
+                message = response.json().get("error")
+            except ValueError:
+                message = None
+            raise JobError(message or f"{method} {path} failed with HTTP {response.status_code}")
+        return response
+
+    def health(self):
+        # The server's /health payload (including which API keys it has), or None if it is not answering
+        try:
+            health = self._request("GET", "/health", timeout=2).json()
+        except (requests.RequestException, JobError, ValueError):
+            return None
+        return health if health.get("ok") else None
+
+    def submit(self, location, business_type="", max_results=50, batch_size=10, tiled=False,
+               include_has_website=False, delta=False, api_keys=None):
+        # api_keys ({"places": ..., "gemini": ...}) run the job with the caller's keys instead of the server's
+        body = {'location': location, 'business_type': business_type, 'max_results': max_results,
+                'batch_size': batch_size, 'tiled': tiled, 'include_has_website': include_has_website, 'delta': delta}
+        if api_keys:
+            body['api_keys'] = api_keys
+        return self._request("POST", "/jobs", json=body).json()
+
+    def job(self, job_id, log_lines=0):
+        return self._request("GET", f"/jobs/{job_id}", params={"log": log_lines}).json()
+
+    def jobs(self, limit=50):
+        return self._request("GET", "/jobs", params={"limit": limit}).json()["jobs"]
+
+    def log(self, job_id, offset=0):
+        # (new log lines, offset to pass next time)
+        data = self._request("GET", f"/jobs/{job_id}/log", params={"offset": offset}).json()
+        return data["lines"], data["offset"]
+
+    def results(self, job_id, pos=0):
+        # (result rows completed after byte position pos of the job's results, position to pass next time)
+        response = self._request("GET", f"/jobs/{job_id}/results", params={"pos": pos})
+        rows = [json.loads(line) for line in response.text.splitlines() if line.strip()]
+        return rows, int(response.headers["X-Results-Position"])
+
+    def stream_results(self, job_id, offset=0, follow=True):
+        # Yields result rows as the job writes them; with follow, until the job ends
+        response = self._request("GET", f"/jobs/{job_id}/results", params={"offset": offset, "follow": int(follow)},
+                                 stream=True, timeout=None if follow else REQUEST_TIMEOUT)
+        with response:
+            for line in response.iter_lines(decode_unicode=True):
+                if line:
+                    yield json.loads(line)
+
+    def cancel(self, job_id):
+        return self._request("POST", f"/jobs/{job_id}/cancel").json()
+
+    def download(self, job_id, fmt):
+        # Bytes of the job's txt, csv or jsonl output
+        return self._request("GET", f"/jobs/{job_id}/files/{fmt}").content
+
+
+def ensure_server(base_url=None, **server_kwargs):
+    # A client for base_url, starting an embedded JobServer on its port if nothing answers there
+    global _embedded_server
+    client = JobClient(base_url or DEFAULT_SERVER_URL)
+    if client.health():
+        return client
+    from urllib.parse import urlsplit
+    from job_server import JobServer
+    with _embedded_lock:
+        if _embedded_server is None:
+            address = urlsplit(client.base_url)
+            try:
+                _embedded_server = JobServer(address.hostname, address.port, **server_kwargs).start()
+            except OSError:
+                # Another process bound the port first; use its server
+                if client.health():
+                    return client
+                raise
+    return client
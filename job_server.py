@@ -0,0 +1,549 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from dotenv import load_dotenv
+
+from events import RunMonitor
+from rate_limiter import RateLimiter
+from result_sinks import make_sinks
+
+# Headless job service. Sweeps are submitted over HTTP, kept in a persistent SQLite queue and
+# run by a pool of worker threads in this one process, so every job shares the checker's
+# on-disk caches, the leads index and a single Gemini rate limiter. Each job writes its own
+# results under jobs/<job_id>/. A job that was running when the server stopped is resumed
+# from its run journal on the next start.
+#
+#   python job_server.py --port 8770 --workers 2
+#
+#   GET  /health                    server status and which API keys the server itself has
+#   POST /jobs                      {"location": ..., "business_type", "max_results", "batch_size",
+#                                    "tiled", "include_has_website", "delta", "api_keys"} -> job
+#   GET  /jobs                      recent jobs
+#   GET  /jobs/<id>?log=100         status, progress, summary and the last 100 log lines
+#   GET  /jobs/<id>/log?offset=N    log lines after the first N
+#   GET  /jobs/<id>/results?pos=B  result rows completed after byte B of results.jsonl, as JSON
+#                                   lines; the X-Results-Position header is the B for the next poll
+#   GET  /jobs/<id>/results?offset=N&follow=1
+#                                   result rows after the first N; follow=1 keeps streaming until the job ends
+#   GET  /jobs/<id>/files/<txt|csv|jsonl>
+#   POST /jobs/<id>/cancel
+#
+# A job ends done, cancelled, failed, or incomplete when some places never got a Gemini answer
+# or their Place Details.
+# api_keys ({"places": ..., "gemini": ...}) lets a client run its job with its own keys; they
+# are held in memory only, never written to the queue, and a job without them (or one resumed
+# after a restart) uses the server's environment. job_client.py wraps this API; both front
+# ends submit their sweeps through it.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8770
+DEFAULT_JOBS_DIR = "jobs"
+MAX_LOG_LINES = 1000
+# Live logs and progress are kept for this many finished jobs; older ones keep their stored status
+KEEP_FINISHED_MONITORS = 20
+RESULT_FORMATS = ('txt', 'csv', 'jsonl')
+ACTIVE_STATUSES = ('queued', 'running')
+
+JOB_PARAMS = {
+    'location': str,
+    'business_type': str,
+    'max_results': int,
+    'batch_size': int,
+    'tiled': bool,
+    'include_has_website': bool,
+    'delta': bool,
+}
+JOB_DEFAULTS = {'business_type': "", 'max_results': 50, 'batch_size': 10, 'tiled': False,
+                'include_has_website': False, 'delta': False}
+
+
+def new_job_id():
+    return time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+
+
+def job_credentials(body):
+    # Pops the optional api_keys from a submitted JSON body as checker keyword arguments
+    keys = body.pop('api_keys', None) or {}
+    if not isinstance(keys, dict):
+        raise ValueError("api_keys must be an object")
+    return {'places_api_key': keys.get('places') or None, 'gemini_api_key': keys.get('gemini') or None}
+
+
+def job_params(body):
+    # Validated sweep parameters from a submitted JSON body; raises ValueError
+    unknown = set(body) - set(JOB_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown parameters: {', '.join(sorted(unknown))}")
+    params = dict(JOB_DEFAULTS)
+    for name, kind in JOB_PARAMS.items():
+        if name in body and body[name] is not None:
+            params[name] = kind(body[name])
+    if not params.get('location', "").strip():
+        raise ValueError("location is required")
+    if params['max_results'] < 1 or params['batch_size'] < 1:
+        raise ValueError("max_results and batch_size must be positive")
+    return params
+
+
+def query_ints(query, defaults):
+    # The non-negative integer query parameters named in defaults; raises ValueError
+    values = {}
+    for name, default in defaults.items():
+        try:
+            values[name] = int(query.get(name, default))
+        except ValueError:
+            values[name] = -1
+        if values[name] < 0:
+            raise ValueError(f"{name} must be a non-negative integer")
+    return values
+
+
+class JobStore:
+    def __init__(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " job_id TEXT PRIMARY KEY,"
+                " status TEXT NOT NULL,"
+                " params TEXT NOT NULL,"
+                " run_id TEXT,"
+                " summary TEXT,"
+                " error TEXT,"
+                " created_at REAL NOT NULL,"
+                " started_at REAL,"
+                " finished_at REAL)"
+            )
+
+    def _row(self, cursor, row):
+        job = dict(zip([c[0] for c in cursor.description], row))
+        job['params'] = json.loads(job['params'])
+        job['summary'] = json.loads(job['summary']) if job['summary'] else None
+        return job
+
+    def create(self, params):
+        job_id = new_job_id()
+        with self._lock, self._conn:
+            self._conn.execute("INSERT INTO jobs (job_id, status, params, created_at) VALUES (?, 'queued', ?, ?)",
+                               (job_id, json.dumps(params), time.time()))
+        return self.get(job_id)
+
+    def get(self, job_id):
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,))
+            row = cursor.fetchone()
+            return self._row(cursor, row) if row else None
+
+    def list(self, limit=50):
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,))
+            return [self._row(cursor, row) for row in cursor.fetchall()]
+
+    def claim_next(self):
+        # The oldest queued job, marked running, or None
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1").fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE jobs SET status = 'running', started_at = ? WHERE job_id = ?",
+                               (time.time(), row[0]))
+        return self.get(row[0])
+
+    def update(self, job_id, **fields):
+        if 'summary' in fields:
+            fields['summary'] = json.dumps(fields['summary']) if fields['summary'] is not None else None
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+
+    def cancel_queued(self, job_id):
+        # True if the job was still queued and is now cancelled
+        with self._lock, self._conn:
+            changed = self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE job_id = ? AND status = 'queued'",
+                (time.time(), job_id)).rowcount
+        return changed == 1
+
+    def requeue_interrupted(self):
+        with self._lock, self._conn:
+            return self._conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'").rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JobServer:
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=2, jobs_dir=DEFAULT_JOBS_DIR,
+                 gemini_rpm=None, gemini_tpm=None, checker_kwargs=None):
+        from main_places_api import GEMINI_REQUESTS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE
+        load_dotenv()
+        self.jobs_dir = jobs_dir
+        self.workers = max(1, int(workers))
+        self.checker_kwargs = dict(checker_kwargs or {})
+        self.store = JobStore(os.path.join(jobs_dir, "jobs.sqlite3"))
+        # One limiter for every worker, so concurrent jobs together stay inside the Gemini quota
+        self.rate_limiter = RateLimiter(gemini_rpm or GEMINI_REQUESTS_PER_MINUTE, gemini_tpm or GEMINI_TOKENS_PER_MINUTE)
+        self.monitors = {}
+        self._finished_monitors = deque()
+        self.cancels = {}
+        self.credentials = {}
+        self._wakeup = threading.Condition()
+        self._stopping = threading.Event()
+        self._threads = []
+        handler = type("BoundJobHandler", (JobHandler,), {"server_state": self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        requeued = self.store.requeue_interrupted()
+        if requeued:
+            print(f"[JOBS] Resuming {requeued} interrupted job(s)")
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{n + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self.httpd.serve_forever, name="job-http", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        for cancel in list(self.cancels.values()):
+            cancel.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def job_dir(self, job_id):
+        return os.path.join(self.jobs_dir, job_id)
+
+    def result_path(self, job_id, fmt):
+        return os.path.join(self.job_dir(job_id), f"results.{fmt}")
+
+    def submit(self, params, credentials=None):
+        job = self.store.create(params)
+        if credentials and any(credentials.values()):
+            self.credentials[job['job_id']] = credentials
+        with self._wakeup:
+            self._wakeup.notify()
+        return job
+
+    def cancel(self, job_id):
+        if self.store.cancel_queued(job_id):
+            self.credentials.pop(job_id, None)
+        elif self.store.get(job_id)['status'] == 'running':
+            # setdefault, not get: a job just claimed by a worker may not have its event yet,
+            # and _run_job picks up this one
+            self.cancels.setdefault(job_id, threading.Event()).set()
+            if self.store.get(job_id)['status'] != 'running':
+                self.cancels.pop(job_id, None)  # finished meanwhile; nothing will pop the event
+        return self.store.get(job_id)
+
+    def view(self, job, log_lines=0):
+        # The job as returned by the API: stored fields plus live progress and output paths
+        monitor = self.monitors.get(job['job_id'])
+        view = dict(job)
+        view['files'] = {fmt: os.path.abspath(self.result_path(job['job_id'], fmt)) for fmt in RESULT_FORMATS}
+        if monitor is not None:
+            fraction, label = monitor.progress()
+            view['progress'] = {'fraction': fraction, 'label': label}
+            view['log_count'] = monitor.log_count
+            if log_lines:
+                view['log'] = list(monitor.log_lines)[-log_lines:]
+        else:
+            done = job['status'] not in ACTIVE_STATUSES
+            view['progress'] = {'fraction': 1.0 if done else 0.0, 'label': job['status'].capitalize()}
+            view['log_count'] = 0
+        cancel = self.cancels.get(job['job_id'])
+        if job['status'] == 'running' and cancel is not None and cancel.is_set():
+            view['status'] = 'cancelling'
+        return view
+
+    def has_keys(self):
+        return {'places': bool(os.environ.get("GOOGLE_PLACES_API_KEY")), 'gemini': bool(os.environ.get("GEMINI_API_KEY"))}
+
+    def _new_checker(self, credentials):
+        from main_places_api import GooglePlacesBusinessChecker
+        return GooglePlacesBusinessChecker(rate_limiter=self.rate_limiter, log_to_console=False,
+                                           **credentials, **self.checker_kwargs)
+
+    def _worker(self):
+        # Each worker keeps one checker for the server's own keys; a job sent with its caller's
+        # keys gets a checker of its own, closed when the job ends so the keys are not kept
+        server_checker = None
+        while not self._stopping.is_set():
+            job = self.store.claim_next()
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(timeout=1.0)
+                continue
+            credentials = self.credentials.get(job['job_id'], {})
+            try:
+                if any(credentials.values()):
+                    checker = self._new_checker(credentials)
+                else:
+                    if server_checker is None:
+                        server_checker = self._new_checker({})
+                    checker = server_checker
+            except Exception as e:
+                self.credentials.pop(job['job_id'], None)
+                self.store.update(job['job_id'], status='failed', error=str(e), finished_at=time.time())
+                continue
+            try:
+                self._run_job(checker, job)
+            finally:
+                if checker is not server_checker:
+                    checker.close()
+
+    def _run_job(self, checker, job):
+        job_id = job['job_id']
+        params = job['params']
+        os.makedirs(self.job_dir(job_id), exist_ok=True)
+        monitor = RunMonitor(max_log_lines=MAX_LOG_LINES, keep_results=False)
+        self.monitors[job_id] = monitor
+        cancel = self.cancels.setdefault(job_id, threading.Event())
+
+        def on_event(event):
+            monitor(event)
+            if event["type"] == "run_start" and event.get("run_id") and event["run_id"] != job['run_id']:
+                self.store.update(job_id, run_id=event["run_id"])
+
+        unsubscribe = checker.events.subscribe(on_event)
+        resume = job['run_id']
+        sinks = make_sinks(RESULT_FORMATS, basename=os.path.join(self.job_dir(job_id), "results"),
+                           include_has_website=params['include_has_website'], append=bool(resume))
+        print(f"[JOBS] {job_id} started: {params['location']} ({params['business_type'] or 'all'})")
+        status = 'failed'
+        try:
+            summary = checker.run_search(params['location'], params['business_type'], max_results=params['max_results'],
+                                         batch_size=params['batch_size'], tiled=params['tiled'], sinks=sinks,
+                                         include_has_website=params['include_has_website'], collect_results=False,
+                                         resume=resume, cancel=cancel, delta=params['delta'])
+            if summary['cancelled'] and self._stopping.is_set():
+                # Stopped with the server rather than by a user; resumed on the next start
+                status = 'queued'
+                self.store.update(job_id, status=status)
+            else:
+                error = None
+                if summary['cancelled']:
+                    status = 'cancelled'
+                elif summary['unanswered'] or summary['details_failed']:
+                    # Some places got no Gemini answer or details; the run journal stays resumable
+                    status = 'incomplete'
+                    error = (f"{summary['unanswered']} businesses got no AI answer, "
+                             f"{summary['details_failed']} got no Place Details")
+                else:
+                    status = 'done'
+                self.store.update(job_id, status=status, summary=summary, error=error, finished_at=time.time())
+        except Exception as e:
+            self.store.update(job_id, status='failed', error=str(e) or type(e).__name__, finished_at=time.time())
+            status = 'failed'
+        finally:
+            unsubscribe()
+            self.cancels.pop(job_id, None)
+            if status != 'queued':
+                self.credentials.pop(job_id, None)
+            self._retire_monitor(job_id)
+        print(f"[JOBS] {job_id} {status}")
+
+    def _retire_monitor(self, job_id):
+        # Keeps the monitors of the last KEEP_FINISHED_MONITORS finished jobs, so a long-running
+        # server does not hold every job's log
+        self._finished_monitors.append(job_id)
+        while len(self._finished_monitors) > KEEP_FINISHED_MONITORS:
+            old_id = self._finished_monitors.popleft()
+            if old_id not in self.cancels:
+                self.monitors.pop(old_id, None)
+
+
+class JobHandler(BaseHTTPRequestHandler):
+    server_state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self):
+        parts = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        return [p for p in parts.path.split("/") if p], query
+
+    def _job_or_404(self, job_id):
+        job = self.server_state.store.get(job_id)
+        if job is None:
+            self._send_json({"error": f"No job {job_id}"}, status=404)
+        return job
+
+    def do_GET(self):
+        state = self.server_state
+        path, query = self._route()
+        try:
+            numbers = query_ints(query, {"limit": 50, "log": 0, "offset": 0, "pos": 0})
+        except ValueError as e:
+            return self._send_json({"error": str(e)}, status=400)
+        if path == ["health"]:
+            return self._send_json({"ok": True, "workers": state.workers, "keys": state.has_keys()})
+        if path == ["jobs"]:
+            return self._send_json({"jobs": [state.view(job) for job in state.store.list(numbers["limit"])]})
+        if len(path) < 2 or path[0] != "jobs":
+            return self._send_json({"error": "not found"}, status=404)
+        job = self._job_or_404(path[1])
+        if job is None:
+            return
+        if len(path) == 2:
+            return self._send_json(state.view(job, numbers["log"]))
+        if path[2:] == ["log"]:
+            monitor = state.monitors.get(job['job_id'])
+            lines, offset = monitor.log_since(numbers["offset"]) if monitor else ([], 0)
+            return self._send_json({"lines": lines, "offset": offset, "status": job['status']})
+        if path[2:] == ["results"] and "pos" in query and query.get("follow") != "1":
+            return self._send_results_since(job, numbers["pos"])
+        if path[2:] == ["results"]:
+            return self._stream_results(job, numbers["offset"], query.get("follow") == "1")
+        if len(path) == 4 and path[2] == "files" and path[3] in RESULT_FORMATS:
+            return self._send_file(state.result_path(job['job_id'], path[3]))
+        self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        state = self.server_state
+        path, _ = self._route()
+        if path == ["jobs"]:
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+                credentials = job_credentials(body)
+                params = job_params(body)
+            except (ValueError, TypeError, AttributeError) as e:
+                return self._send_json({"error": str(e)}, status=400)
+            return self._send_json(state.view(state.submit(params, credentials)), status=201)
+        if len(path) == 3 and path[0] == "jobs" and path[2] == "cancel":
+            if self._job_or_404(path[1]) is None:
+                return
+            return self._send_json(state.view(state.cancel(path[1])))
+        self._send_json({"error": "not found"}, status=404)
+
+    def _send_file(self, path):
+        if not os.path.exists(path):
+            return self._send_json({"error": "No results yet"}, status=404)
+        with open(path, "rb") as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Disposition", f'attachment; filename="{os.path.basename(path)}"')
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_results_since(self, job, pos):
+        # Rows after byte pos, read without re-parsing what a poller already has; a row that is
+        # still being written is left for the next poll
+        path = self.server_state.result_path(job['job_id'], "jsonl")
+        body = b""
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                f.seek(pos)
+                body = f.read()
+        body = body[:body.rfind(b"\n") + 1]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("X-Results-Position", str(pos + len(body)))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream_results(self, job, offset, follow):
+        # JSON lines from the job's results.jsonl, skipping the first `offset` rows. The response
+        # has no length and ends when the connection closes, after the job has finished if follow
+        state = self.server_state
+        path = state.result_path(job['job_id'], "jsonl")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        self.close_connection = True
+        seen, pending = 0, ""
+        f = None
+        try:
+            while True:
+                # Status is read before the file so rows written just before the job ended are still sent
+                done = not follow or state.store.get(job['job_id'])['status'] not in ACTIVE_STATUSES
+                if f is None and os.path.exists(path):
+                    f = open(path, encoding="utf-8")
+                chunk = f.read() if f is not None else ""
+                if chunk:
+                    *lines, pending = (pending + chunk).split("\n")
+                    for line in lines:
+                        if line.strip():
+                            seen += 1
+                            if seen > offset:
+                                self.wfile.write((line + "\n").encode("utf-8"))
+                    self.wfile.flush()
+                    continue
+                if done:
+                    break
+                time.sleep(0.25)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            if f is not None:
+                f.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a local job queue for website checks.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=2, help="Jobs run at the same time")
+    parser.add_argument("--jobs-dir", default=DEFAULT_JOBS_DIR)
+    parser.add_argument("--gemini-rpm", type=int, default=None, help="Gemini requests/minute shared by all jobs")
+    parser.add_argument("--gemini-tpm", type=int, default=None, help="Gemini tokens/minute shared by all jobs")
+    args = parser.parse_args(argv)
+    server = JobServer(args.host, args.port, args.workers, args.jobs_dir, args.gemini_rpm, args.gemini_tpm)
+    server.start()
+    print(f"[JOBS] Serving on {server.base_url} with {server.workers} workers (jobs in {args.jobs_dir}/)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
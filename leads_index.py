@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Local index of every place a sweep has classified, so a repeat sweep of the same area only
+# fetches and classifies what is new or changed. For each place_id it keeps the last-known
+# website, fingerprints of the cheap search fields and of the details record, and the last
+# classification; for each area it records which places the latest sweep saw, which is how
+# removed places are found.
+
+DEFAULT_INDEX_PATH = "leads_index.sqlite3"
+
+# Known places are re-fetched after this long even if their search fields look unchanged
+DEFAULT_RECHECK_AFTER = 30 * 24 * 3600
+
+
+def _fingerprint(*values):
+    return hashlib.sha1(json.dumps(values, separators=(",", ":")).encode("utf-8")).hexdigest()[:16]
+
+
+def search_fingerprint(business):
+    # Fields that come free with every Nearby Search result
+    return _fingerprint(business.get('name'), business.get('vicinity'))
+
+
+def details_fingerprint(record):
+    urls = [link.get('url') for link in record.get('links') or [] if link]
+    return _fingerprint(urls, record.get('phones') or [], record.get('text_snippet') or "")
+
+
+def area_key(location, business_type="", tiled=False):
+    # Tiled and single-circle searches of a location cover different areas, so they are kept apart
+    key = f"{' '.join(location.lower().split())}|{business_type or ''}"
+    return key + "|tiled" if tiled else key
+
+
+class LeadsIndex:
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS places ("
+                " place_id TEXT PRIMARY KEY,"
+                " name TEXT,"
+                " maps_url TEXT,"
+                " website TEXT,"
+                " search_fp TEXT NOT NULL,"
+                " details_fp TEXT NOT NULL,"
+                " status TEXT NOT NULL,"
+                " reason TEXT,"
+                " source TEXT,"
+                " first_seen REAL NOT NULL,"
+                " checked_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS area_places ("
+                " area TEXT NOT NULL,"
+                " place_id TEXT NOT NULL,"
+                " last_sweep TEXT NOT NULL,"
+                " removed_at REAL,"
+                " PRIMARY KEY (area, place_id))"
+            )
+
+    def lookup(self, place_ids):
+        # place_id -> stored row (as a dict) for the ids that are indexed
+        rows = {}
+        place_ids = list(place_ids)
+        with self._lock:
+            for start in range(0, len(place_ids), 500):
+                chunk = place_ids[start:start + 500]
+                cursor = self._conn.execute(
+                    f"SELECT * FROM places WHERE place_id IN ({','.join('?' * len(chunk))})", chunk)
+                columns = [c[0] for c in cursor.description]
+                for row in cursor.fetchall():
+                    rows[row[0]] = dict(zip(columns, row))
+        return rows
+
+    def mark_seen(self, area, place_ids, sweep_id):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO area_places (area, place_id, last_sweep, removed_at) VALUES (?, ?, ?, NULL)"
+                " ON CONFLICT (area, place_id) DO UPDATE SET last_sweep = excluded.last_sweep, removed_at = NULL",
+                [(area, place_id, sweep_id) for place_id in place_ids],
+            )
+
+    def record(self, results):
+        # Stores (details record, classification) pairs; returns the previous rows by place_id
+        now = time.time()
+        previous = self.lookup(business['place_id'] for business, _ in results)
+        rows = []
+        for business, classification in results:
+            links = [link.get('url') for link in business.get('links') or [] if link]
+            old = previous.get(business['place_id'])
+            rows.append((
+                business['place_id'], business.get('name'), business.get('maps_url'), links[0] if links else None,
+                search_fingerprint(business), details_fingerprint(business), classification['status'],
+                classification.get('reason', ''), classification.get('source', 'ai'),
+                old['first_seen'] if old else now, now,
+            ))
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO places VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return previous
+
+    def mark_removed(self, area, sweep_id):
+        # Places of area that sweep_id did not see; they are flagged removed and returned
+        now = time.time()
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT a.place_id, p.name, p.maps_url, p.status FROM area_places a LEFT JOIN places p USING (place_id)"
+                " WHERE a.area = ? AND a.last_sweep != ? AND a.removed_at IS NULL",
+                (area, sweep_id),
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE area_places SET removed_at = ? WHERE area = ? AND place_id = ?",
+                [(now, area, row[0]) for row in rows],
+            )
+        return [{'place_id': r[0], 'name': r[1], 'maps_url': r[2], 'status': r[3]} for r in rows]
+
+    def stats(self):
+        with self._lock:
+            places = self._conn.execute("SELECT COUNT(*) FROM places").fetchone()[0]
+            areas = self._conn.execute("SELECT COUNT(DISTINCT area) FROM area_places").fetchone()[0]
+        return {'places': places, 'areas': areas}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class DeltaSweep:
+    # One delta run over an area: see() notes every place the search returned, before any
+    # other filter drops some; filter() keeps only new places, places whose search fields
+    # changed and places not checked for recheck_after seconds; record() stores each
+    # committed batch; finish() flags places the sweep no longer saw. The report collects
+    # added, changed (status differs from the last sweep), removed and unchanged places.
+    def __init__(self, index, area, sweep_id, recheck_after=DEFAULT_RECHECK_AFTER):
+        self.index = index
+        self.area = area
+        self.sweep_id = sweep_id
+        self.recheck_after = recheck_after
+        self.added = []
+        self.changed = []
+        self.removed = []
+        self.unchanged = 0
+        self.rechecked = 0
+
+    def filter(self, businesses):
+        known = self.index.lookup(b['place_id'] for b in businesses)
+        stale_before = time.time() - self.recheck_after
+        kept = []
+        for business in businesses:
+            row = known.get(business['place_id'])
+            if row is None:
+                kept.append(business)
+            elif row['search_fp'] != search_fingerprint(business) or row['checked_at'] < stale_before:
+                self.rechecked += 1
+                kept.append(business)
+            else:
+                self.unchanged += 1
+        return kept
+
+    def see(self, businesses):
+        self.index.mark_seen(self.area, [b['place_id'] for b in businesses], self.sweep_id)
+
+    def record(self, results):
+        previous = self.index.record(results)
+        for business, classification in results:
+            old = previous.get(business['place_id'])
+            entry = {'place_id': business['place_id'], 'name': business.get('name'),
+                     'maps_url': business.get('maps_url'), 'status': classification['status']}
+            if old is None:
+                self.added.append(entry)
+            elif old['status'] != classification['status']:
+                entry['previous_status'] = old['status']
+                self.changed.append(entry)
+
+    def finish(self):
+        self.removed = self.index.mark_removed(self.area, self.sweep_id)
+
+    def report(self):
+        return {
+            'added': self.added,
+            'changed': self.changed,
+            'removed': self.removed,
+            'unchanged': self.unchanged,
+            'rechecked': self.rechecked,
+        }
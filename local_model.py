@@ -0,0 +1,244 @@
+import argparse
+import glob
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+import zlib
+from urllib.parse import urlsplit
+
+from preclassifier import NO_WEBSITE, HAS_WEBSITE
+from run_journal import RunJournal, DEFAULT_RUN_DIR
+
+# Small CPU-only classifier distilled from past Gemini decisions. Records are turned into
+# hashed features (link hosts and domains, whether the business name appears in a link,
+# name and snippet words, phone count) and scored with a logistic regression. The checker
+# answers a record locally only when the model is at least `threshold` confident either
+# way; everything else still goes to Gemini.
+#
+#   python local_model.py train                 # learn from runs/*.sqlite3, write local_model.json
+#   python local_model.py evaluate              # hold-out agreement with Gemini, coverage, throughput
+#
+# Training data comes from the run journals, which keep each place's details record next to
+# its classification. Rule decisions are skipped; cached answers count, since they came from
+# Gemini originally. Result CSVs cannot be used: they keep the reason but not the links.
+
+DEFAULT_MODEL_PATH = "local_model.json"
+DEFAULT_THRESHOLD = 0.9
+HASH_BITS = 18
+# A model trained on fewer examples of either status would answer everything one way
+MIN_EXAMPLES_PER_CLASS = 20
+SNIPPET_TOKENS = 60
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _hash(feature, buckets):
+    return zlib.crc32(feature.encode("utf-8")) % buckets
+
+
+def _host(url):
+    host = urlsplit(url if "://" in url else "http://" + url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def features(record):
+    # Feature strings for one details record (or dict with the same keys)
+    urls = [link.get('url') for link in record.get('links') or [] if link and link.get('url')]
+    name_words = [w for w in _WORD.findall((record.get('name') or "").lower())]
+    feats = [f"links={min(len(urls), 3)}", f"phones={min(len(record.get('phones') or []), 2)}"]
+    for url in urls:
+        host = _host(url)
+        parts = host.split(".")
+        feats.append("host=" + host)
+        feats.append("tld=" + parts[-1])
+        if len(parts) >= 2:
+            feats.append("domain=" + ".".join(parts[-2:]))
+        path = urlsplit(url if "://" in url else "http://" + url).path.strip("/").split("/")[0]
+        if path:
+            feats.append("path=" + path.lower()[:30])
+        if any(len(w) >= 4 and w in host for w in name_words):
+            feats.append("name_in_host")
+    feats.extend("name:" + w for w in name_words)
+    feats.extend("snip:" + w for w in _WORD.findall((record.get('text_snippet') or "").lower())[:SNIPPET_TOKENS])
+    return feats
+
+
+class LocalClassifier:
+    def __init__(self, weights=None, bias=0.0, hash_bits=HASH_BITS, threshold=DEFAULT_THRESHOLD):
+        self.hash_bits = hash_bits
+        self.buckets = 1 << hash_bits
+        self.weights = weights or {}
+        self.bias = bias
+        self.threshold = threshold
+
+    def _indices(self, record):
+        return {_hash(f, self.buckets) for f in features(record)}
+
+    def predict_proba(self, record):
+        # Probability that the record has NO official website
+        z = self.bias + sum(self.weights.get(i, 0.0) for i in self._indices(record))
+        return 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, z))))
+
+    def classify(self, business):
+        # A classification dict shaped like Gemini's when confident, else None
+        p = self.predict_proba(business)
+        if p >= self.threshold:
+            status, confidence = NO_WEBSITE, p
+        elif p <= 1.0 - self.threshold:
+            status, confidence = HAS_WEBSITE, 1.0 - p
+        else:
+            return None
+        return {
+            'business_name': business.get('name'),
+            'status': status,
+            'reason': f"Local model ({confidence:.0%} confident), trained on earlier AI decisions.",
+            'source': 'local',
+        }
+
+    def train(self, records, labels, epochs=8, learning_rate=0.2, l2=1e-6, seed=13):
+        # Plain SGD logistic regression over the hashed features; labels are 1 for NO_WEBSITE
+        examples = [(list(self._indices(r)), y) for r, y in zip(records, labels)]
+        weights = dict(self.weights)
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(examples)
+            rate = learning_rate / (1.0 + epoch)
+            for indices, y in examples:
+                z = self.bias + sum(weights.get(i, 0.0) for i in indices)
+                error = 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, z)))) - y
+                self.bias -= rate * error
+                for i in indices:
+                    w = weights.get(i, 0.0)
+                    weights[i] = w - rate * (error + l2 * w)
+        self.weights = {i: w for i, w in weights.items() if abs(w) > 1e-6}
+        return self
+
+    def save(self, path=DEFAULT_MODEL_PATH):
+        data = {
+            'version': 1,
+            'hash_bits': self.hash_bits,
+            'threshold': self.threshold,
+            'bias': self.bias,
+            'weights': {str(i): round(w, 6) for i, w in self.weights.items()},
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path=DEFAULT_MODEL_PATH, threshold=None):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(
+            weights={int(i): w for i, w in data['weights'].items()},
+            bias=data['bias'],
+            hash_bits=data['hash_bits'],
+            threshold=threshold if threshold is not None else data.get('threshold', DEFAULT_THRESHOLD),
+        )
+
+
+def load_decisions(run_dir=DEFAULT_RUN_DIR):
+    # (details record, status) for every Gemini-decided place in the run journals, latest per place_id
+    decisions = {}
+    for path in sorted(glob.glob(os.path.join(run_dir, "*.sqlite3")), key=os.path.getmtime):
+        journal = RunJournal(path, os.path.splitext(os.path.basename(path))[0])
+        try:
+            for record, classification in journal.decisions():
+                if classification.get('source') in ('rules', 'local'):
+                    continue
+                if classification.get('status') in (NO_WEBSITE, HAS_WEBSITE):
+                    decisions[record['place_id']] = (record, classification['status'])
+        finally:
+            journal.close()
+    return list(decisions.values())
+
+
+def _split(decisions, holdout=0.2):
+    # Deterministic split by place_id so repeated evaluations use the same hold-out set
+    train, test = [], []
+    for record, status in decisions:
+        (test if zlib.crc32(record['place_id'].encode("utf-8")) % 1000 < holdout * 1000 else train).append((record, status))
+    return train, test
+
+
+def train_model(decisions, threshold=DEFAULT_THRESHOLD, epochs=8):
+    model = LocalClassifier(threshold=threshold)
+    return model.train([r for r, _ in decisions], [1 if s == NO_WEBSITE else 0 for _, s in decisions], epochs=epochs)
+
+
+def evaluate(model, decisions):
+    answered = agreed = overall = 0
+    for record, status in decisions:
+        p = model.predict_proba(record)
+        overall += (p >= 0.5) == (status == NO_WEBSITE)
+        classification = model.classify(record)
+        if classification is not None:
+            answered += 1
+            agreed += classification['status'] == status
+    # Throughput over the same records, repeated until at least a fifth of a second has passed
+    scored, started = 0, time.perf_counter()
+    while decisions and (scored == 0 or time.perf_counter() - started < 0.2):
+        for record, _ in decisions:
+            model.classify(record)
+        scored += len(decisions)
+    seconds = time.perf_counter() - started
+    n = len(decisions)
+    return {
+        'records': n,
+        'threshold': model.threshold,
+        'coverage': round(answered / n, 3) if n else 0.0,
+        'agreement_when_answered': round(agreed / answered, 3) if answered else None,
+        'agreement_overall': round(overall / n, 3) if n else None,
+        'records_per_second': round(scored / seconds) if seconds else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train or evaluate the local website classifier.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train_parser = sub.add_parser("train", help="Train on all Gemini decisions in the run journals")
+    evaluate_parser = sub.add_parser("evaluate", help="Report agreement with Gemini and throughput")
+    for p in (train_parser, evaluate_parser):
+        p.add_argument("--runs", default=DEFAULT_RUN_DIR, help="Directory of run journals")
+        p.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+        p.add_argument("--epochs", type=int, default=8)
+    train_parser.add_argument("--out", default=DEFAULT_MODEL_PATH)
+    evaluate_parser.add_argument("--model", help="Evaluate this saved model on every decision instead of a hold-out split")
+    evaluate_parser.add_argument("--json", help="Also write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    decisions = load_decisions(args.runs)
+    labels = [s for _, s in decisions]
+    print(f"{len(decisions)} Gemini decisions in {args.runs} "
+          f"({labels.count(NO_WEBSITE)} no website, {labels.count(HAS_WEBSITE)} has website)")
+    if min(labels.count(NO_WEBSITE), labels.count(HAS_WEBSITE)) < MIN_EXAMPLES_PER_CLASS:
+        print(f"Need at least {MIN_EXAMPLES_PER_CLASS} decisions of each status; run more sweeps first")
+        return 1
+    if args.command == "train":
+        model = train_model(decisions, args.threshold, args.epochs)
+        model.save(args.out)
+        print(f"Saved {len(model.weights)} weights to {args.out}")
+        return 0
+    if args.model:
+        model, test = LocalClassifier.load(args.model, args.threshold), decisions
+    else:
+        train, test = _split(decisions)
+        if not train or not test:
+            print("Not enough decisions for a hold-out split")
+            return 1
+        model = train_model(train, args.threshold, args.epochs)
+        print(f"Trained on {len(train)}, evaluating on {len(test)} held-out decisions")
+    report = evaluate(model, test)
+    for key, value in report.items():
+        print(f"{key:<26}{value}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,20 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext
 import threading
+import queue
 import os
+import time
 from dotenv import load_dotenv
-from main_places_api import GooglePlacesBusinessChecker
+from job_client import ensure_server
+
+# Worker threads never touch Tk widgets: they queue output lines, and the main loop drains
+# the queue every OUTPUT_POLL_MS with one insert per tick, keeping at most MAX_OUTPUT_LINES.
+# Analyses run as jobs on the local job server (see job_server.py), polled every JOB_POLL_SECONDS.
+OUTPUT_POLL_MS = 100
+MAX_OUTPUT_LINES = 2000
+JOB_POLL_SECONDS = 0.5
+ACTIVE_JOB_STATUSES = ("queued", "running", "cancelling")
+_RUN_FINISHED = object()
 
 class BusinessCheckerGUI:
     def __init__(self, root):
@@ -61,6 +72,8 @@ class BusinessCheckerGUI:
         # Add Places API button
         self.places_btn = ttk.Button(frm, text="Analyse with Places API", command=self.start_places_analysis, style='TButton')
         self.places_btn.grid(row=4, column=0, columnspan=2, pady=(8, 0), sticky=tk.EW)
+        self.cancel_btn = ttk.Button(frm, text="Cancel", command=self.cancel_analysis, style='TButton', state=tk.DISABLED)
+        self.cancel_btn.grid(row=4, column=2, padx=(16, 0), pady=(8, 0), sticky=tk.EW)
 
         # Output area frame
         output_frame = ttk.Frame(root, padding=(10, 8, 10, 10), style='TFrame')
@@ -86,27 +99,37 @@ class BusinessCheckerGUI:
             import webbrowser
             webbrowser.open_new("https://geethikaisuru.com")
         footer.bind("<Button-1>", open_author_link)
+        self.client = None
+        self.cancel_event = None
+        self.output_queue = queue.Queue()
+        self.root.after(OUTPUT_POLL_MS, self.pump_output)
 
     def start_places_analysis(self):
         self.places_btn.config(state=tk.DISABLED)
+        self.cancel_event = threading.Event()
+        self.cancel_btn.config(state=tk.NORMAL)
         self.output.config(state='normal')
         self.output.delete(1.0, tk.END)
         self.output.insert(tk.END, "Starting analysis with Google Places API...\n")
         self.output.config(state='disabled')
         threading.Thread(target=self.run_places_checker, daemon=True).start()
 
+    def cancel_analysis(self):
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.cancel_btn.config(state=tk.DISABLED)
+            self.append_output("Cancelling... waiting for AI batches already sent.\n")
+
     def run_places_checker(self):
+        try:
+            self._run_places_checker()
+        finally:
+            self.output_queue.put(_RUN_FINISHED)
+
+    def _run_places_checker(self):
         from dotenv import load_dotenv
         load_dotenv()
         import os
-        if not os.environ.get("GEMINI_API_KEY"):
-            self.append_output("ERROR: GEMINI_API_KEY is not set in environment or .env file.\n")
-            self.places_btn.config(state=tk.NORMAL)
-            return
-        if not os.environ.get("GOOGLE_PLACES_API_KEY"):
-            self.append_output("ERROR: GOOGLE_PLACES_API_KEY is not set in environment or .env file.\n")
-            self.places_btn.config(state=tk.NORMAL)
-            return
         location = self.location_var.get().strip() or "Nugegoda, Sri Lanka"
         try:
             max_results = int(self.max_results_var.get())
@@ -116,29 +139,78 @@ class BusinessCheckerGUI:
             batch_size = int(self.batch_size_var.get())
         except ValueError:
             batch_size = 10
-        checker = GooglePlacesBusinessChecker()
-        import builtins
-        orig_print = print
-        def print_to_output(*args, **kwargs):
-            msg = ' '.join(str(a) for a in args)
-            self.append_output(msg + '\n')
-            orig_print(*args, **kwargs)
-        builtins.print = print_to_output
         try:
-            checker.run_search(location, max_results=max_results, batch_size=batch_size)
-            self.append_output("\nAnalysis complete!\n")
-            self.append_output(f"Results saved to places_businesses_without_websites.txt and .csv\n")
+            if self.client is None:
+                self.client = ensure_server()
+            client = self.client
+            # Keys from this machine's environment/.env go with the job; the server's own are the fallback
+            api_keys = {'gemini': os.environ.get("GEMINI_API_KEY"), 'places': os.environ.get("GOOGLE_PLACES_API_KEY")}
+            server_keys = (client.health() or {}).get("keys", {})
+            if not (api_keys['gemini'] or server_keys.get('gemini')):
+                self.append_output("ERROR: GEMINI_API_KEY is not set in environment or .env file.\n")
+                return
+            if not (api_keys['places'] or server_keys.get('places')):
+                self.append_output("ERROR: GOOGLE_PLACES_API_KEY is not set in environment or .env file.\n")
+                return
+            job = client.submit(location, max_results=max_results, batch_size=batch_size, api_keys=api_keys)
+            job_id = job["job_id"]
+            self.append_output(f"Submitted job {job_id}\n")
+            offset = 0
+            cancel_sent = False
+            while True:
+                if self.cancel_event.is_set() and not cancel_sent:
+                    client.cancel(job_id)
+                    cancel_sent = True
+                # Status first, so the last log lines are fetched after the job has ended
+                job = client.job(job_id)
+                lines, offset = client.log(job_id, offset)
+                if lines:
+                    self.append_output('\n'.join(lines) + '\n')
+                if job["status"] not in ACTIVE_JOB_STATUSES:
+                    break
+                time.sleep(JOB_POLL_SECONDS)
+            files = f"{job['files']['txt']} and .csv"
+            if job["status"] == "failed":
+                self.append_output(f"Error: {job['error']}\n")
+            elif job["status"] == "incomplete":
+                self.append_output(f"\nAnalysis incomplete: {job['error']}. Results so far are in {files}\n")
+            elif job["status"] == "cancelled":
+                self.append_output(f"\nAnalysis cancelled. Results so far are in {files}\n")
+            else:
+                self.append_output("\nAnalysis complete!\n")
+                self.append_output(f"Results saved to {files}\n")
         except Exception as e:
             self.append_output(f"Error: {e}\n")
-        finally:
-            builtins.print = orig_print
-            self.places_btn.config(state=tk.NORMAL)
 
     def append_output(self, text):
-        self.output.config(state='normal')
-        self.output.insert(tk.END, text)
-        self.output.see(tk.END)
-        self.output.config(state='disabled')
+        # Safe from any thread; the text appears on the next pump_output tick
+        self.output_queue.put(text)
+
+    def pump_output(self):
+        chunks = []
+        finished = False
+        while True:
+            try:
+                item = self.output_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _RUN_FINISHED:
+                finished = True
+            else:
+                chunks.append(item)
+        if chunks:
+            self.output.config(state='normal')
+            self.output.insert(tk.END, ''.join(chunks))
+            excess = int(self.output.index('end-1c').split('.')[0]) - MAX_OUTPUT_LINES
+            if excess > 0:
+                self.output.delete('1.0', f'{excess + 1}.0')
+            self.output.see(tk.END)
+            self.output.config(state='disabled')
+        if finished:
+            self.places_btn.config(state=tk.NORMAL)
+            self.cancel_btn.config(state=tk.DISABLED)
+            self.cancel_event = None
+        self.root.after(OUTPUT_POLL_MS, self.pump_output)
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -3,20 +3,241 @@ import requests
 import time
 import csv
 import json
+import hashlib
 from dotenv import load_dotenv
-from google import genai
-from google.genai import types
 import http.client
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from requests.adapters import HTTPAdapter
+from places_cache import SQLiteCache, DEFAULT_CACHE_PATH
+from preclassifier import RuleClassifier
+from rate_limiter import RateLimiter, estimate_tokens
+from prompt_builder import PromptBuilder, encode_record, record_id, SNIPPET_CHARS
+from stream_parser import ClassificationStreamParser
+from result_sinks import make_sinks, DEFAULT_BASENAME
+from run_journal import RunJournal, DEFAULT_RUN_DIR, new_run_id
+from events import EventBus, ConsoleSubscriber, JsonMetricsFile
+from records import PlaceRecord
+from local_model import LocalClassifier, DEFAULT_MODEL_PATH
+from leads_index import LeadsIndex, DeltaSweep, area_key, DEFAULT_INDEX_PATH, DEFAULT_RECHECK_AFTER
+import area_tiles
+
+PLACES_BASE_URL = "https://maps.googleapis.com/maps/api"
+
+# Place Details statuses worth retrying. NOT_FOUND gives an empty result; any other status
+# (REQUEST_DENIED, INVALID_REQUEST, ...) fails the place without retrying.
+RETRYABLE_PLACES_STATUSES = {"OVER_QUERY_LIMIT", "UNKNOWN_ERROR"}
+
+# Nearby Search returns at most 3 pages of 20 results per query
+NEARBY_SEARCH_CAP = 60
+
+# Marks the end of the details -> classification pipeline queue
+_PIPELINE_DONE = object()
+
+# Streaming runs journal and filter discovered places in chunks of this size
+STREAM_CHUNK_SIZE = 50
+
+# Place Details field sets for the tiered fetch. The basic set is all the rules need and stays
+# in the cheaper Basic/Contact SKUs; the rich set is requested only for ambiguous records.
+# Only fields _details_record reads are requested: name and place_id come from the search result.
+DETAILS_BASIC_FIELDS = "website,formatted_phone_number"
+DETAILS_RICH_FIELDS = "editorial_summary"
+
+
+class PlacesApiError(Exception):
+    # A Places API status that retrying will not fix, e.g. a bad or restricted key
+    pass
+
+
+def _is_retryable_gemini_error(e):
+    # Quota/overload responses and dropped connections are retried; anything else is not
+    if isinstance(e, (requests.exceptions.ConnectionError, http.client.RemoteDisconnected, ConnectionError, TimeoutError)):
+        return True
+    if getattr(e, 'code', None) in (429, 500, 503) or 'RESOURCE_EXHAUSTED' in str(e):
+        return True
+    try:
+        import httpx
+    except ImportError:
+        return False
+    return isinstance(e, httpx.TransportError)
+
+
+def _text(value):
+    # The prompt's string form of a field value (None becomes "")
+    return "" if value is None else str(value)
+
+
+def _join_fields(*field_sets):
+    fields = []
+    for field_set in field_sets:
+        if isinstance(field_set, str):
+            field_set = field_set.split(",")
+        for field in field_set:
+            field = field.strip()
+            if field and field not in fields:
+                fields.append(field)
+    return ",".join(fields)
+
+
+GEOCODE_CACHE_TTL = 30 * 24 * 3600
+DETAILS_CACHE_TTL = 7 * 24 * 3600
+CLASSIFICATION_CACHE_TTL = 90 * 24 * 3600
+
+# Gemini quota defaults (gemini-2.0-flash-lite free tier) and batch packing budget
+GEMINI_REQUESTS_PER_MINUTE = 30
+GEMINI_TOKENS_PER_MINUTE = 1000000
+MAX_BATCH_TOKENS = 8000
+GEMINI_OUTPUT_TOKENS_PER_RECORD = 40
+RECORD_OVERHEAD_TOKENS = 2
+
+VALID_STATUSES = ("HAS_WEBSITE", "NO_WEBSITE")
+
+# Bump whenever the classification prompt changes so cached Gemini answers are not reused
+PROMPT_VERSION = "2"
+
+# google.genai takes several hundred milliseconds to import, so it is only loaded the first
+# time a batch is classified. Clients are shared per API key across checkers in a process.
+_gemini_clients = {}
+_gemini_clients_lock = threading.Lock()
+
+
+def get_gemini_client(api_key, base_url=None):
+    key = api_key if base_url is None else (api_key, base_url)
+    with _gemini_clients_lock:
+        client = _gemini_clients.get(key)
+        if client is None:
+            from google import genai
+            if base_url:
+                from google.genai import types
+                client = genai.Client(api_key=api_key, http_options=types.HttpOptions(base_url=base_url))
+            else:
+                client = genai.Client(api_key=api_key)
+            _gemini_clients[key] = client
+        return client
+
 
 class GooglePlacesBusinessChecker:
-    def __init__(self):
+    def __init__(self, details_workers=8, details_retries=3, request_timeout=15, pipeline_depth=2, search_workers=6,
+                 cache_path=DEFAULT_CACHE_PATH, cache_max_entries=50000,
+                 geocode_ttl=GEOCODE_CACHE_TTL, details_ttl=DETAILS_CACHE_TTL,
+                 rule_classifier=None, use_rules=True, classification_ttl=CLASSIFICATION_CACHE_TTL,
+                 tiered_details=True, basic_fields=DETAILS_BASIC_FIELDS, rich_fields=DETAILS_RICH_FIELDS,
+                 classify_workers=4, max_batch_tokens=MAX_BATCH_TOKENS, rate_limiter=None,
+                 gemini_rpm=GEMINI_REQUESTS_PER_MINUTE, gemini_tpm=GEMINI_TOKENS_PER_MINUTE,
+                 places_base_url=None, gemini_base_url=None, page_token_delay=2.0,
+                 events=None, debug=False, log_to_console=True, metrics_path=None,
+                 index_path=DEFAULT_INDEX_PATH, local_model=None, local_model_path=DEFAULT_MODEL_PATH,
+                 local_threshold=None, places_api_key=None, gemini_api_key=None):
         load_dotenv()
-        self.gemini_client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
+        # Progress, timings and counters are published on self.events; see events.py
+        if events is None:
+            events = EventBus(debug=debug)
+            if log_to_console:
+                events.subscribe(ConsoleSubscriber())
+        self.events = events
+        if metrics_path:
+            self.events.subscribe(JsonMetricsFile(metrics_path))
+        # Keys passed in (e.g. per job by job_server.py) take precedence over the environment
+        self.gemini_api_key = gemini_api_key or os.environ.get("GEMINI_API_KEY")
+        # Endpoints can be redirected (e.g. to benchmarks/fake_servers.py) by argument or environment
+        self.places_base_url = (places_base_url or os.environ.get("PLACES_API_BASE_URL") or PLACES_BASE_URL).rstrip("/")
+        self.gemini_base_url = gemini_base_url or os.environ.get("GEMINI_API_BASE_URL") or None
+        self.page_token_delay = page_token_delay
         self.model = "gemini-2.0-flash-lite"
         self.businesses_without_websites = []
-        self.places_api_key = os.environ.get("GOOGLE_PLACES_API_KEY")
+        self.no_website_count = 0
+        self.collect_results = True
+        self.last_run_id = None
+        self.places_api_key = places_api_key or os.environ.get("GOOGLE_PLACES_API_KEY")
         if not self.places_api_key:
             raise Exception("GOOGLE_PLACES_API_KEY not set in .env file.")
+        self.details_workers = max(1, int(details_workers))
+        self.details_retries = max(1, int(details_retries))
+        self.request_timeout = request_timeout
+        self.pipeline_depth = max(1, int(pipeline_depth))
+        self.search_workers = max(1, int(search_workers))
+        self.session = self._build_session(max(self.details_workers, self.search_workers))
+        # cache_path=None disables the on-disk geocode/details cache
+        self.cache = SQLiteCache(cache_path, max_entries=cache_max_entries) if cache_path else None
+        self.geocode_ttl = geocode_ttl
+        self.details_ttl = details_ttl
+        # Obvious records (no links, only social/booking/Google pages) are decided without Gemini
+        self.rule_classifier = (rule_classifier or RuleClassifier()) if use_rules else None
+        self.classification_ttl = classification_ttl
+        # A distilled local model (see local_model.py) answers confident ambiguous records before
+        # Gemini; it is used when passed in or when a trained model file exists
+        if local_model is None and local_model_path and os.path.exists(local_model_path):
+            local_model = LocalClassifier.load(local_model_path, local_threshold)
+        self.local_model = local_model
+        self.tiered_details = tiered_details
+        self.basic_fields = _join_fields(basic_fields)
+        self.rich_fields = _join_fields(rich_fields)
+        self.classify_workers = max(1, int(classify_workers))
+        self.max_batch_tokens = max_batch_tokens
+        # Pass one RateLimiter to several checkers to make them share a Gemini quota
+        self.rate_limiter = rate_limiter or RateLimiter(gemini_rpm, gemini_tpm)
+        self.prompt_builder = PromptBuilder()
+        # The leads index for delta sweeps is only opened the first time one runs
+        self.index_path = index_path
+        self._leads_index = None
+        self._leads_index_lock = threading.Lock()
+
+    def _build_session(self, pool_size):
+        # One keep-alive session shared by every worker thread so TLS handshakes are reused
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(pool_size, 4))
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def close(self):
+        # Releases the HTTP session, caches and this key's shared Gemini client, e.g. once a
+        # checker built for one job's API keys is done
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+        with self._leads_index_lock:
+            if self._leads_index is not None:
+                self._leads_index.close()
+                self._leads_index = None
+        key = self.gemini_api_key if self.gemini_base_url is None else (self.gemini_api_key, self.gemini_base_url)
+        with _gemini_clients_lock:
+            _gemini_clients.pop(key, None)
+
+    def _log(self, message):
+        self.events.log(message)
+
+    def _get_json(self, url, params=None, call="http"):
+        self.events.count(f"api.{call}")
+        with self.events.timed(call):
+            resp = self.session.get(url, params=params, timeout=self.request_timeout)
+            resp.raise_for_status()
+            return resp.json()
+
+    @property
+    def gemini_client(self):
+        return get_gemini_client(self.gemini_api_key, self.gemini_base_url)
+
+    @property
+    def leads_index(self):
+        with self._leads_index_lock:
+            if self._leads_index is None:
+                self._leads_index = LeadsIndex(self.index_path)
+            return self._leads_index
+
+    def _cache_get(self, namespace, key):
+        if self.cache is None:
+            return None
+        return self.cache.get(namespace, key)
+
+    def _cache_set(self, namespace, key, value, ttl):
+        if self.cache is not None:
+            self.cache.set(namespace, key, value, ttl=ttl)
+
+    def cache_stats(self):
+        return self.cache.stats() if self.cache is not None else {}
 
     def _deep_sanitize(self, obj):
         if isinstance(obj, dict):
@@ -28,27 +249,46 @@ class GooglePlacesBusinessChecker:
         else:
             return str(obj)
 
-    def search_businesses_in_area(self, location, business_type="", max_results=50):
-        print(f"[PLACES] Searching for: {business_type or 'All businesses'} in {location}")
-        # Geocode location to lat/lng
-        geocode_url = f"https://maps.googleapis.com/maps/api/geocode/json?address={requests.utils.quote(location)}&key={self.places_api_key}"
-        print(f"[PLACES][DEBUG] Geocoding URL: {geocode_url}")
-        geo_resp = requests.get(geocode_url).json()
-        print(f"[PLACES][DEBUG] Geocoding raw response: {json.dumps(geo_resp, indent=2)}")
-        print(f"[PLACES][DEBUG] Geocoding status: {geo_resp.get('status')}")
+    def geocode_location(self, location):
+        # First Geocoding result for location (cached by normalized address), or None
+        geocode_url = f"{self.places_base_url}/geocode/json?address={requests.utils.quote(location)}&key={self.places_api_key}"
+        if self.events.debug:
+            self._log(f"[PLACES][DEBUG] Geocoding URL: {geocode_url}")
+        geocode_key = " ".join(location.lower().split())
+        geo_resp = self._cache_get("geocode", geocode_key)
+        if geo_resp is not None:
+            self._log(f"[PLACES] Geocode cache hit for: {location}")
+        else:
+            geo_resp = self._get_json(geocode_url, call="geocode")
+            if geo_resp.get('status') == 'OK':
+                self._cache_set("geocode", geocode_key, geo_resp, self.geocode_ttl)
+        if self.events.debug:
+            # Full payload dumps are only built when debug output is enabled
+            self._log(f"[PLACES][DEBUG] Geocoding raw response: {json.dumps(geo_resp, indent=2)}")
+            self._log(f"[PLACES][DEBUG] Geocoding status: {geo_resp.get('status')}")
         if geo_resp.get('status') != 'OK' or not geo_resp.get('results'):
-            print(f"[PLACES][ERROR] Could not geocode location. Status: {geo_resp.get('status')}")
+            self._log(f"[PLACES][ERROR] Could not geocode location. Status: {geo_resp.get('status')}")
             if 'error_message' in geo_resp:
-                print(f"[PLACES][ERROR] Geocoding error message: {geo_resp['error_message']}")
-            return []
-        latlng = geo_resp['results'][0]['geometry']['location']
-        lat, lng = latlng['lat'], latlng['lng']
-        print(f"[PLACES] Geocoded to: {lat}, {lng}")
-        # Search for places
-        url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
+                self._log(f"[PLACES][ERROR] Geocoding error message: {geo_resp['error_message']}")
+            return None
+        return geo_resp['results'][0]
+
+    def _business_from_result(self, result):
+        return PlaceRecord(
+            name=result.get('name'),
+            place_id=result.get('place_id'),
+            vicinity=result.get('vicinity'),
+            maps_url=f"https://www.google.com/maps/place/?q=place_id:{result.get('place_id')}",
+        )
+
+    def _nearby_search(self, lat, lng, radius, business_type="", max_results=NEARBY_SEARCH_CAP, cancel=None):
+        # One Nearby Search circle, following next_page_token up to the API's 60-result cap
+        # (or until the threading.Event cancel is set).
+        # Returns (businesses, saturated) where saturated means the cap was hit.
+        url = f"{self.places_base_url}/place/nearbysearch/json"
         params = {
             "location": f"{lat},{lng}",
-            "radius": 5000,  # 5km radius
+            "radius": int(min(radius, 50000)),
             "type": business_type if business_type else None,
             "key": self.places_api_key
         }
@@ -58,89 +298,344 @@ class GooglePlacesBusinessChecker:
         while len(businesses) < max_results:
             if next_page_token:
                 params['pagetoken'] = next_page_token
-                time.sleep(2)  # Google requires a short wait for next page
-            resp = requests.get(url, params=params).json()
+                # Google requires a short wait for next page; a cancel ends the wait and the search
+                if cancel is not None:
+                    if cancel.wait(self.page_token_delay):
+                        break
+                else:
+                    time.sleep(self.page_token_delay)
+            resp = self._get_json(url, params=params, call="nearbysearch")
+            if resp.get('status') not in ('OK', 'ZERO_RESULTS'):
+                self.events.count("errors.search")
+                self._log(f"[PLACES][WARN] Nearby Search returned {resp.get('status')} at {lat:.5f},{lng:.5f}")
+                break
             for result in resp.get('results', []):
-                businesses.append({
-                    'name': result.get('name'),
-                    'place_id': result.get('place_id'),
-                    'vicinity': result.get('vicinity'),
-                    'maps_url': f"https://www.google.com/maps/place/?q=place_id:{result.get('place_id')}"
-                })
+                businesses.append(self._business_from_result(result))
                 if len(businesses) >= max_results:
                     break
             next_page_token = resp.get('next_page_token')
             if not next_page_token:
                 break
-        print(f"[PLACES] Found {len(businesses)} businesses.")
-        return businesses[:max_results]
+        return businesses[:max_results], len(businesses) >= NEARBY_SEARCH_CAP
 
-    def get_business_detailed_info(self, business):
-        # Get details for a business using Place Details API
-        url = "https://maps.googleapis.com/maps/api/place/details/json"
+    def search_businesses_in_area(self, location, business_type="", max_results=50, cancel=None):
+        return list(self.iter_businesses_in_area(location, business_type, max_results, cancel))
+
+    def iter_businesses_in_area(self, location, business_type="", max_results=50, cancel=None):
+        self._log(f"[PLACES] Searching for: {business_type or 'All businesses'} in {location}")
+        geocoded = self.geocode_location(location)
+        if geocoded is None:
+            self.events.count("errors.search")
+            return
+        latlng = geocoded['geometry']['location']
+        lat, lng = latlng['lat'], latlng['lng']
+        self._log(f"[PLACES] Geocoded to: {lat}, {lng}")
+        businesses, saturated = self._nearby_search(lat, lng, 5000, business_type, max_results, cancel)  # 5km radius
+        if saturated:
+            # The API's result cap was hit, so places in the area may be missing
+            self.events.count("search.saturated")
+        self._log(f"[PLACES] Found {len(businesses)} businesses.")
+        yield from businesses[:max_results]
+
+    def search_businesses_tiled(self, location, business_type="", max_results=500,
+                                tile_radius=2000, max_tiles=64, max_depth=2, min_radius=250, cancel=None):
+        return list(self.iter_businesses_tiled(location, business_type, max_results, tile_radius, max_tiles,
+                                               max_depth, min_radius, cancel))
+
+    def iter_businesses_tiled(self, location, business_type="", max_results=500,
+                              tile_radius=2000, max_tiles=64, max_depth=2, min_radius=250, cancel=None):
+        # Sweep the geocoded viewport with a grid of Nearby Search circles queried concurrently
+        # (so the page-token waits overlap), splitting saturated tiles into four smaller ones.
+        # Results are deduplicated by place_id and yielded as each tile completes; only the
+        # place_ids seen so far are kept. Setting the threading.Event cancel stops the sweep:
+        # queued tiles are dropped and running ones stop following page tokens.
+        self._log(f"[PLACES] Tiled search for: {business_type or 'All businesses'} in {location}")
+        geocoded = self.geocode_location(location)
+        if geocoded is None:
+            self.events.count("errors.search")
+            return
+        tiles = area_tiles.grid_tiles(area_tiles.viewport_from_geocode(geocoded), tile_radius, max_tiles)
+        self._log(f"[PLACES] Sweeping {len(tiles)} tiles of {tiles[0][2]:.0f} m radius ({self.search_workers} workers)")
+        seen = set()
+        queried = 0
+        cancelled = cancel.is_set if cancel is not None else lambda: False
+        with ThreadPoolExecutor(max_workers=self.search_workers) as executor:
+            pending = {executor.submit(self._nearby_search, lat, lng, radius, business_type, cancel=cancel): ((lat, lng, radius), 0)
+                       for lat, lng, radius in tiles}
+            try:
+                while pending and len(seen) < max_results and not cancelled():
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        tile, depth = pending.pop(future)
+                        queried += 1
+                        try:
+                            found, saturated = future.result()
+                        except (requests.exceptions.RequestException, ValueError) as e:
+                            self.events.count("errors.search")
+                            self._log(f"[PLACES][WARN] Tile {tile[0]:.5f},{tile[1]:.5f} failed: {e}")
+                            continue
+                        new = []
+                        for business in found:
+                            if business['place_id'] not in seen and len(seen) < max_results:
+                                seen.add(business['place_id'])
+                                new.append(business)
+                        self._log(f"[PLACES] Tile {queried}: {len(found)} results, {len(new)} new ({len(seen)} total)")
+                        if saturated and depth < max_depth and tile[2] / 2 >= min_radius:
+                            for child in area_tiles.subdivide_tile(tile):
+                                pending[executor.submit(self._nearby_search, child[0], child[1], child[2], business_type,
+                                                        cancel=cancel)] = (child, depth + 1)
+                        elif saturated:
+                            # Too small or deep to split again, so places in this tile may be missing
+                            self.events.count("search.saturated")
+                        yield from new
+            finally:
+                for future in pending:
+                    future.cancel()
+        if cancelled():
+            self._log(f"[PLACES] Search cancelled after {queried} tiles ({len(seen)} businesses).")
+            return
+        self._log(f"[PLACES] Found {len(seen)} unique businesses across {queried} tiles.")
+
+    def _fetch_place_details(self, place_id, fields):
+        # Raw Place Details result for one field set, cached per (place_id, fields)
+        cache_key = f"{place_id}|{fields}"
+        result = self._cache_get("details", cache_key)
+        if result is not None:
+            return result
+        url = f"{self.places_base_url}/place/details/json"
         params = {
-            "place_id": business['place_id'],
-            "fields": "name,website,formatted_phone_number,formatted_address,url,review,user_ratings_total,types,geometry,photos,editorial_summary",
+            "place_id": place_id,
+            "fields": fields,
             "key": self.places_api_key
         }
-        resp = requests.get(url, params=params).json()
+        resp = self._get_json(url, params=params, call="details")
+        if resp.get('status') in RETRYABLE_PLACES_STATUSES:
+            raise requests.exceptions.RetryError(f"Place Details returned {resp.get('status')}")
+        if resp.get('status') not in ('OK', 'NOT_FOUND'):
+            message = resp.get('error_message')
+            raise PlacesApiError(f"Place Details returned {resp.get('status')}" + (f": {message}" if message else ""))
         result = resp.get('result', {})
+        if resp.get('status') == 'OK':
+            self._cache_set("details", cache_key, result, self.details_ttl)
+        return result
+
+    def _details_record(self, business, result):
         links = []
         if result.get('website'):
             links.append({'url': result['website'], 'text': 'Official Website'})
         phones = [result.get('formatted_phone_number')] if result.get('formatted_phone_number') else []
         text_snippet = result.get('editorial_summary', {}).get('overview', '')
+        return PlaceRecord(
+            name=business['name'],
+            place_id=business['place_id'],
+            vicinity=business.get('vicinity'),
+            maps_url=business['maps_url'],
+            links=links,
+            phones=phones,
+            text_snippet=text_snippet,
+        )
+
+    def get_business_detailed_info(self, business):
+        # Get details for a business using Place Details API. In tiered mode the first request
+        # asks only for the fields the rules need; the richer field set is fetched only when
+        # the rules cannot decide the record and it has to go to Gemini.
+        if not self.tiered_details or self.rule_classifier is None:
+            result = self._fetch_place_details(business['place_id'], _join_fields(self.basic_fields, self.rich_fields))
+            return self._details_record(business, result)
+        result = self._fetch_place_details(business['place_id'], self.basic_fields)
+        record = self._details_record(business, result)
+        if self.rule_classifier.classify(record) is not None:
+            return record
+        result = dict(result, **self._fetch_place_details(business['place_id'], self.rich_fields))
+        return self._details_record(business, result)
+
+    def _get_details_with_retry(self, business, journal=None):
+        for attempt in range(self.details_retries):
+            try:
+                detailed_info = self.get_business_detailed_info(business)
+                if journal is not None:
+                    journal.record_details(business['place_id'], detailed_info)
+                return detailed_info
+            except PlacesApiError as e:
+                self.events.count("errors.details")
+                self._log(f"[PLACES][ERROR] No details for {business['name']}: {e}")
+                return None
+            except (requests.exceptions.RequestException, http.client.RemoteDisconnected, ValueError) as e:
+                if attempt + 1 == self.details_retries:
+                    self.events.count("errors.details")
+                    self._log(f"[PLACES][ERROR] Giving up on details for {business['name']}: {e}")
+                    return None
+                wait_time = 2 ** attempt
+                self.events.count("retries.details")
+                self._log(f"[PLACES][WARN] Details error for {business['name']} (attempt {attempt+1}/{self.details_retries}): {e}. Retrying in {wait_time} seconds...")
+                time.sleep(wait_time)
+
+    def iter_business_details(self, businesses, journal=None, known_details=None):
+        # Yield detailed records in input order. At most details_workers * 2 requests are
+        # in flight, so a slow consumer throttles fetching instead of letting it run ahead.
+        # Businesses whose details could not be fetched are dropped (and counted as
+        # errors.details). Records already in
+        # known_details (by place_id) are reused; newly fetched ones are written to journal.
+        # businesses may be any iterable; progress totals are only reported for sized ones.
+        if known_details is None:
+            known_details = {}
+        total = len(businesses) if hasattr(businesses, '__len__') else None
+        window = self.details_workers * 2
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.details_workers) as executor:
+            for i, business in enumerate(businesses, 1):
+                known = known_details.get(business['place_id'])
+                if known is not None:
+                    future = Future()
+                    future.set_result(PlaceRecord.from_dict(known))
+                else:
+                    future = executor.submit(self._get_details_with_retry, business, journal)
+                pending.append((i, business, future))
+                if len(pending) < window:
+                    continue
+                detailed_info = self._pop_details(pending, total)
+                if detailed_info is not None:
+                    yield detailed_info
+            while pending:
+                detailed_info = self._pop_details(pending, total)
+                if detailed_info is not None:
+                    yield detailed_info
+
+    def _pop_details(self, pending, total):
+        i, business, future = pending.popleft()
+        detailed_info = future.result()
+        self._log(f"Got details for business {i}/{total or '?'}: {business['name']}")
+        self.events.progress("details", i, total)
+        return detailed_info
+
+    def fetch_business_details(self, businesses):
+        return list(self.iter_business_details(businesses))
+
+    def preclassify(self, business):
+        # Rules first, then previously cached Gemini answers for an identical payload, then the
+        # local model if it is confident
+        if self.rule_classifier is not None:
+            classification = self.rule_classifier.classify(business)
+            if classification is not None:
+                return classification
+        classification = self.cached_classification(business)
+        if classification is None and self.local_model is not None:
+            classification = self.local_model.classify(business)
+        return classification
+
+    def _produce_detail_batches(self, businesses, batch_size, batches, stop, journal=None, known_details=None):
+        # Queue items are ("decided", [(business, classification), ...]) for records decided
+        # by rules, the classification cache or the local model, and ("gemini", [business, ...])
+        # for batches of ambiguous records. A Gemini batch closes at batch_size records or when
+        # the next record would push its estimated prompt size past max_batch_tokens. Decided
+        # records are sent on every batch_size records and ahead of each Gemini batch, so they
+        # reach the sinks and journal as the run goes rather than all at the end.
+        def put(item):
+            # Blocks while the classifier is pipeline_depth batches behind, unless the run stopped
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        decided = []
+
+        def send_gemini(batch):
+            if decided:
+                if not put(("decided", list(decided))):
+                    return False
+                decided.clear()
+            return put(("gemini", batch))
+        try:
+            with self.events.stage("details") as stage:
+                batch = []
+                batch_tokens = 0
+                for detailed_info in self.iter_business_details(businesses, journal, known_details):
+                    if stop.is_set():
+                        return
+                    stage["items"] += 1
+                    classification = self.preclassify(detailed_info)
+                    if classification is not None:
+                        decided.append((detailed_info, classification))
+                        if len(decided) >= batch_size:
+                            if not put(("decided", list(decided))):
+                                return
+                            decided.clear()
+                        continue
+                    record_tokens = self.estimate_record_tokens(detailed_info)
+                    if batch and batch_tokens + record_tokens > self.max_batch_tokens:
+                        if not send_gemini(batch):
+                            return
+                        batch, batch_tokens = [], 0
+                    batch.append(detailed_info)
+                    batch_tokens += record_tokens
+                    if len(batch) == batch_size:
+                        if not send_gemini(batch):
+                            return
+                        batch, batch_tokens = [], 0
+                if decided:
+                    put(("decided", list(decided)))
+                if batch:
+                    put(("gemini", batch))
+        except Exception as e:
+            put(e)
+        finally:
+            put(_PIPELINE_DONE)
+
+    def _classification_payload(self, business):
+        # The sanitized fields that go into the prompt for one business. Only these fields are
+        # converted, and the snippet is cut before it is copied.
         return {
-            'name': business['name'],
-            'maps_url': business['maps_url'],
-            'links': links,
-            'phones': phones,
-            'text_snippet': text_snippet
+            'name': _text(business.get('name')),
+            'links': [_text(link.get('url')) for link in business.get('links') or [] if link],
+            'phones': [_text(phone) for phone in business.get('phones') or []],
+            'text_snippet': _text(business.get('text_snippet'))[:SNIPPET_CHARS],
         }
 
-    def classify_businesses_with_gemini(self, businesses_batch):
-        prompt = (
-            "You are an expert at analyzing Google Maps business listings to determine if a business has an official website. "
-            "You will be given a list of businesses, each with their name, Google Maps URL, any links found (including the API 'website' field), phone numbers, and a text snippet.\n\n"
-            "A business HAS_WEBSITE if:\n"
-            "- There is a link to an official business website (not just social media, review sites, or third-party platforms)\n"
-            "- The website is clearly related to the business (not a generic, unrelated, or placeholder site)\n"
-            "- The link is not just to Facebook, Instagram, TripAdvisor, Booking.com, or similar\n"
-            "- The website is not a Google Maps, Google Sites, or Google Business Profile page\n"
-            "- If you are unsure, classify as NO_WEBSITE (be conservative)\n\n"
-            "A business has NO_WEBSITE if:\n"
-            "- There are only social media links (Facebook, Instagram, etc.)\n"
-            "- There are only phone numbers, addresses, or Google Maps links\n"
-            "- There are only third-party platforms like Yelp, TripAdvisor, Booking.com, etc.\n"
-            "- There is no clear website reference or domain link\n"
-            "- If you are unsure, classify as NO_WEBSITE\n\n"
-            "Here are the businesses to analyze:\n\n"
-        )
-        for i, business in enumerate(businesses_batch, 1):
-            name = self._deep_sanitize(business.get('name'))
-            maps_url = self._deep_sanitize(business.get('maps_url'))
-            links = business.get('links')
-            if links is None:
-                links = []
-            sanitized_links = self._deep_sanitize(links)
-            phones = business.get('phones')
-            if phones is None:
-                phones = []
-            sanitized_phones = self._deep_sanitize(phones)
-            text_snippet = self._deep_sanitize(business.get('text_snippet'))
-            prompt += f"""
-Business {i}: {name}
-Google Maps URL: {maps_url}
-Links found: {json.dumps(sanitized_links, indent=2)}
-Phone numbers: {sanitized_phones}
-Text snippet: {text_snippet[:500]}...
----
-"""
-        prompt += (
-            "\nPlease respond in this exact JSON format:\n{\n  \"classifications\": [\n    {\"business_name\": \"Business Name\", \"status\": \"HAS_WEBSITE\", \"reason\": \"Brief explanation\"},\n    {\"business_name\": \"Business Name\", \"status\": \"NO_WEBSITE\", \"reason\": \"Brief explanation\"}\n  ]\n}\n\nOnly include the JSON response, no other text."
-        )
+    def estimate_record_tokens(self, business):
+        return estimate_tokens(encode_record("b000", self._classification_payload(business))) + RECORD_OVERHEAD_TOKENS
+
+    def _classification_key(self, business):
+        payload = json.dumps(self._classification_payload(business), sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(f"{self.model}\n{PROMPT_VERSION}\n{payload}".encode("utf-8")).hexdigest()
+
+    def cached_classification(self, business):
+        cached = self._cache_get("classification", self._classification_key(business))
+        if cached is None:
+            return None
+        return {'business_name': business.get('name'), 'status': cached['status'], 'reason': cached['reason'], 'source': 'cache'}
+
+    def _store_classification(self, business, classification):
+        value = {'status': classification['status'], 'reason': classification.get('reason', '')}
+        self._cache_set("classification", self._classification_key(business), value, self.classification_ttl)
+
+    def stream_classifications(self, businesses_batch):
+        # Yield Gemini's classifications for the batch as each entry of the streamed
+        # "classifications" array completes. Every entry carries the id of its record in
+        # businesses_batch (see prompt_builder.record_id) plus the matching business_name.
+        # If the stream is cut off, malformed in places or skips records, the entries that
+        # did parse are kept and only the unanswered records are sent again.
+        from google.genai import types
+        batch_ids = [record_id(i) for i in range(len(businesses_batch))]
+        remaining = list(range(len(businesses_batch)))
         max_retries = 3
         for attempt in range(max_retries):
+            sub_batch = [businesses_batch[i] for i in remaining]
+            prompt = self.prompt_builder.build([self._classification_payload(business) for business in sub_batch])
+            prompt_tokens = estimate_tokens(prompt) + GEMINI_OUTPUT_TOKENS_PER_RECORD * len(sub_batch)
+            # Ids in this prompt are positions in sub_batch; map them back to the full batch
+            positions = {record_id(j): i for j, i in enumerate(remaining)}
+            parser = ClassificationStreamParser()
+            answered = set()
+            # The shared limiter replaces fixed sleeps: it paces requests/tokens per minute
+            # across all concurrent batches and holds everyone back after a throttling error.
+            self.rate_limiter.acquire(prompt_tokens)
+            self.events.count("api.gemini")
+            self.events.count("tokens.prompt_estimated", prompt_tokens)
+            started = time.perf_counter()
+            usage = None
             try:
                 contents = [
                     types.Content(
@@ -151,32 +646,48 @@ Text snippet: {text_snippet[:500]}...
                 generate_content_config = types.GenerateContentConfig(
                     response_mime_type="application/json",
                 )
-                response_text = ""
                 for chunk in self.gemini_client.models.generate_content_stream(
                     model=self.model,
                     contents=contents,
                     config=generate_content_config,
                 ):
-                    response_text += chunk.text
-                try:
-                    json_start = response_text.find('{')
-                    json_end = response_text.rfind('}') + 1
-                    json_text = response_text[json_start:json_end]
-                    result = json.loads(json_text)
-                    return result['classifications']
-                except json.JSONDecodeError as e:
-                    print(f"[PLACES][ERROR] Error parsing JSON response: {e}")
-                    print(f"[PLACES][ERROR] Raw response: {response_text}")
-                    return []
-            except (requests.exceptions.ConnectionError, http.client.RemoteDisconnected) as e:
-                wait_time = 2 ** attempt
-                print(f"[PLACES][WARN] Connection error (attempt {attempt+1}/{max_retries}): {e}. Retrying in {wait_time} seconds...")
-                time.sleep(wait_time)
+                    usage = getattr(chunk, 'usage_metadata', None) or usage
+                    for entry in parser.feed(chunk.text or ""):
+                        i = positions.get(entry.get('id'))
+                        if i is None or i in answered or entry.get('status') not in VALID_STATUSES:
+                            self._log(f"[PLACES][WARN] Ignoring unexpected AI entry: {json.dumps(entry)[:200]}")
+                            continue
+                        answered.add(i)
+                        entry['id'] = batch_ids[i]
+                        entry['business_name'] = businesses_batch[i]['name']
+                        entry.setdefault('reason', '')
+                        yield entry
+                self.rate_limiter.report_success()
+                self.events.metrics.observe("gemini", time.perf_counter() - started)
+                if usage is not None:
+                    self.events.count("tokens.prompt", getattr(usage, 'prompt_token_count', None) or 0)
+                    self.events.count("tokens.output", getattr(usage, 'candidates_token_count', None) or 0)
             except Exception as e:
-                print(f"[PLACES][ERROR] Error calling Gemini API: {e}")
-                return []
-        print("[PLACES][ERROR] Failed to get response from Gemini API after multiple retries. Skipping this batch.")
-        return []
+                self.events.metrics.observe("gemini", time.perf_counter() - started)
+                if not _is_retryable_gemini_error(e):
+                    self.events.count("errors.gemini")
+                    self._log(f"[PLACES][ERROR] Error calling Gemini API: {e}")
+                    return
+                self.events.count("retries.gemini")
+                pause = self.rate_limiter.report_throttled()
+                self._log(f"[PLACES][WARN] Gemini throttled or disconnected (attempt {attempt+1}/{max_retries}): {e}. Backing off {pause:.1f} seconds...")
+            for error in parser.errors:
+                self._log(f"[PLACES][ERROR] Error parsing JSON response entry: {error}")
+            remaining = [i for i in remaining if i not in answered]
+            if not remaining:
+                return
+            if attempt + 1 < max_retries:
+                state = "complete" if parser.complete else "truncated"
+                self._log(f"[PLACES][WARN] AI response {state} but missing {len(remaining)} businesses; re-queuing only those...")
+        self._log(f"[PLACES][ERROR] Failed to get a Gemini classification for {len(remaining)} businesses after multiple retries. Skipping them.")
+
+    def classify_businesses_with_gemini(self, businesses_batch):
+        return list(self.stream_classifications(businesses_batch))
 
     def save_results_to_file(self, filename="places_businesses_without_websites.txt"):
         try:
@@ -189,10 +700,10 @@ Text snippet: {text_snippet[:500]}...
                     if 'reason' in business:
                         f.write(f"   AI Analysis: {business['reason']}\n")
                     f.write("\n")
-            print(f"[PLACES] Results saved to {filename}")
-            print(f"[PLACES] Found {len(self.businesses_without_websites)} businesses without websites")
+            self._log(f"[PLACES] Results saved to {filename}")
+            self._log(f"[PLACES] Found {len(self.businesses_without_websites)} businesses without websites")
         except Exception as e:
-            print(f"[PLACES][ERROR] Error saving file: {e}")
+            self._log(f"[PLACES][ERROR] Error saving file: {e}")
 
     def save_results_to_csv(self, filename="places_businesses_without_websites.csv"):
         try:
@@ -205,51 +716,441 @@ Text snippet: {text_snippet[:500]}...
                         business['maps_url'],
                         business.get('reason', 'No analysis available')
                     ])
-            print(f"[PLACES] CSV results saved to {filename}")
+            self._log(f"[PLACES] CSV results saved to {filename}")
         except Exception as e:
-            print(f"[PLACES][ERROR] Error saving CSV: {e}")
-
-    def run_search(self, location, business_type="", max_results=50, batch_size=10):
-        print("Starting Google Places business website checker (AI for all businesses, conservative)...")
-        print(f"Location: {location}")
-        print(f"Business type: {business_type or 'All businesses'}")
-        print(f"Batch size: {batch_size} (for AI calls)")
-        print("-" * 60)
-        businesses = self.search_businesses_in_area(location, business_type, max_results)
-        if not businesses:
-            print("No businesses found. Try a different search term or location.")
-            return
-        print(f"Found {len(businesses)} businesses to analyze")
-        print("-" * 60)
-        print("Gathering detailed business information...")
-        detailed_businesses = []
-        for i, business in enumerate(businesses, 1):
-            print(f"Getting details for business {i}/{len(businesses)}: {business['name']}")
-            detailed_info = self.get_business_detailed_info(business)
-            detailed_businesses.append(detailed_info)
-        print("-" * 60)
-        print(f"Sending all {len(detailed_businesses)} businesses to AI for classification...")
-        # Process all businesses in batches
-        for i in range(0, len(detailed_businesses), batch_size):
-            batch = detailed_businesses[i:i + batch_size]
-            batch_num = (i // batch_size) + 1
-            total_batches = (len(detailed_businesses) + batch_size - 1) // batch_size
-            print(f"AI Processing batch {batch_num}/{total_batches} ({len(batch)} businesses)")
-            classifications = self.classify_businesses_with_gemini(batch)
-            for classification in classifications:
-                if classification['status'] == 'NO_WEBSITE':
-                    for business in batch:
-                        if business['name'] == classification['business_name']:
-                            business['reason'] = classification['reason']
-                            self.businesses_without_websites.append(business)
-                            print(f"✓ No website (AI): {business['name']} - {classification['reason']}")
-                            break
+            self._log(f"[PLACES][ERROR] Error saving CSV: {e}")
+
+    def _record_classification(self, business, classification):
+        source = {'rules': 'rules', 'cache': 'cached AI', 'local': 'local model'}.get(classification.get('source'), 'AI')
+        self.events.count(f"classified.{classification.get('source', 'ai')}")
+        self.events.emit("result", business=business, classification=classification)
+        if classification['status'] == 'NO_WEBSITE':
+            business['reason'] = classification['reason']
+            self.no_website_count += 1
+            if self.collect_results:
+                self.businesses_without_websites.append(business)
+            self._log(f"✓ No website ({source}): {business['name']} - {classification['reason']}")
+        else:
+            self._log(f"✗ Has website ({source}): {business['name']}")
+
+    def _record_answer(self, by_id, classification):
+        # The (business, classification) pair for one Gemini answer, joined through by_id (the
+        # batch's unanswered records, see PromptBuilder.index_batch), or None if it cannot be joined
+        business = by_id.pop(classification.get('id'), None)
+        if business is None:
+            self._log(f"[PLACES][WARN] AI returned an unknown or duplicate id: {classification.get('id')}")
+            return None
+        self._store_classification(business, classification)
+        self._record_classification(business, classification)
+        return business, classification
+
+    def _classify_into(self, key, batch, answers):
+        # Runs on a classify worker: puts (key, entry) on answers for each classification as it
+        # streams in, then (key, None) once the batch is finished
+        try:
+            for entry in self.stream_classifications(batch):
+                answers.put((key, entry))
+        finally:
+            answers.put((key, None))
+
+    def _commit_results(self, sinks, run_journal, results):
+        # Sinks first, then the journal: a crash in between can repeat rows on resume but never lose them
+        for sink in sinks:
+            try:
+                sink.write_batch(results)
+            except OSError as e:
+                self._log(f"[PLACES][ERROR] Error writing results to {sink.path}: {e}")
+        if run_journal is not None and results:
+            run_journal.record_classifications(results)
+
+    def run_search(self, location, business_type="", max_results=50, batch_size=10, tiled=False,
+                   sinks=None, include_has_website=False, collect_results=True,
+                   journal=True, resume=None, run_dir=DEFAULT_RUN_DIR, place_filter=None, cancel=None,
+                   stream=False, delta=False, recheck_after=DEFAULT_RECHECK_AFTER, output=DEFAULT_BASENAME):
+        # Results are streamed to sinks (default: output + .txt and .csv) as they are
+        # decided. collect_results=False skips keeping them in businesses_without_websites.
+        # With journal=True the run is checkpointed under run_dir; resume=<run_id> continues
+        # such a run with its original parameters. Default sinks are then rewritten from the
+        # journal's committed results first, so rows another run wrote to the same files since
+        # are dropped; sinks passed in are appended to.
+        # place_filter(businesses) may drop places before any details are fetched (the batch
+        # runner uses it to skip places already claimed by another location).
+        # Setting the threading.Event cancel stops the run during the search or between batches:
+        # batches already sent to Gemini are finished and saved, the rest are dropped, and the
+        # journal stays resumable.
+        # stream=True never holds the full place list: places flow from the search straight into
+        # details and classification, and are journaled and filtered in chunks. Use it with
+        # collect_results=False for city-scale sweeps.
+        # delta=True consults the leads index (see leads_index.py): places seen before whose
+        # search fields are unchanged and that were checked within recheck_after seconds are
+        # skipped, and the summary reports places added, removed or changed since the last sweep.
+        # Returns a summary dict of the run's counts.
+        # The checker may be reused across runs (e.g. cached by Streamlit), so reset per-run results
+        self.businesses_without_websites = []
+        self.no_website_count = 0
+        self.collect_results = collect_results
+        run_journal = None
+        if resume:
+            run_journal = RunJournal.open(resume, run_dir)
+            params = run_journal.params
+            location = params['location']
+            business_type = params['business_type']
+            max_results = params['max_results']
+            batch_size = params['batch_size']
+            tiled = params['tiled']
+            include_has_website = params['include_has_website']
+            stream = params.get('stream', False)
+            delta = params.get('delta', False)
+            output = params.get('output', output)
+        elif journal:
+            run_journal = RunJournal.create({
+                'location': location,
+                'business_type': business_type,
+                'max_results': max_results,
+                'batch_size': batch_size,
+                'tiled': tiled,
+                'include_has_website': include_has_website,
+                'stream': stream,
+                'delta': delta,
+                'output': output,
+            }, run_dir)
+        self.last_run_id = run_journal.run_id if run_journal is not None else None
+        if sinks is None:
+            sinks = make_sinks(basename=output, include_has_website=include_has_website)
+            if run_journal is not None and resume:
+                self._rewrite_sinks(sinks, run_journal)
+        delta_sweep = None
+        if delta:
+            delta_sweep = DeltaSweep(self.leads_index, area_key(location, business_type, tiled),
+                                     self.last_run_id or new_run_id(), recheck_after)
+        self.events.metrics.reset()
+        self.events.emit("run_start", location=location, business_type=business_type, run_id=self.last_run_id)
+        summary = None
+        error = None
+        try:
+            summary = self._run_journaled(run_journal, bool(resume), location, business_type, max_results,
+                                          batch_size, tiled, sinks, place_filter, cancel, stream, delta_sweep)
+            return summary
+        except BaseException as e:
+            error = str(e) or type(e).__name__
+            raise
+        finally:
+            if run_journal is not None:
+                run_journal.close()
+            self.events.emit("run_end", summary=summary, metrics=self.run_metrics(), error=error)
+
+    def _rewrite_sinks(self, sinks, run_journal):
+        # Starts each sink over with the run's committed results; the run then appends to it
+        decisions = run_journal.decisions()
+        for sink in sinks:
+            with sink:
+                sink.write_batch(decisions)
+            sink.append = True
+
+    def run_metrics(self):
+        # Counters, per-call timings and stage totals for the current run, plus cache hit
+        # rates and rate limiter stats
+        metrics = self.events.metrics.snapshot()
+        caches = {}
+        for namespace, counts in self.cache_stats().items():
+            lookups = counts['hits'] + counts['misses']
+            caches[namespace] = dict(counts, hit_rate=round(counts['hits'] / lookups, 3) if lookups else None)
+        metrics['caches'] = caches
+        metrics['rate_limiter'] = self.rate_limiter.stats()
+        return metrics
+
+    def _list_places(self, run_journal, resuming, location, business_type, max_results, tiled, place_filter, summary,
+                     cancel=None):
+        # The places to analyse as a list, plus saved details when resuming. Returns
+        # (None, None) when the search found nothing.
+        businesses = run_journal.places() if resuming else None
+        if businesses is None:
+            with self.events.stage("search") as stage:
+                if tiled:
+                    businesses = self.search_businesses_tiled(location, business_type, max_results, cancel=cancel)
                 else:
-                    print(f"✗ Has website (AI): {classification['business_name']}")
-            time.sleep(2)
-        print("-" * 60)
-        print(f"Analysis complete!")
-        print(f"Total businesses analyzed: {len(detailed_businesses)}")
-        print(f"Businesses without websites: {len(self.businesses_without_websites)}")
-        self.save_results_to_file()
-        self.save_results_to_csv() 
\ No newline at end of file
+                    businesses = self.search_businesses_in_area(location, business_type, max_results, cancel=cancel)
+                stage["items"] = len(businesses)
+            if cancel is not None and cancel.is_set():
+                # A partial search is not journaled, so a resume searches again
+                return businesses, None
+            if run_journal is not None:
+                run_journal.record_places(businesses)
+        if not businesses:
+            self._log("No businesses found. Try a different search term or location.")
+            if run_journal is not None:
+                run_journal.mark_complete()
+            return None, None
+        summary['found'] = len(businesses)
+        self._log(f"Found {len(businesses)} businesses to analyze")
+        if place_filter is not None:
+            kept = place_filter(businesses)
+            summary['skipped'] = len(businesses) - len(kept)
+            if summary['skipped']:
+                self._log(f"Skipping {summary['skipped']} businesses already handled elsewhere or unchanged since the last sweep")
+            businesses = kept
+        known_details = None
+        if resuming:
+            classified = run_journal.classified_ids()
+            known_details = run_journal.details()
+            businesses = [b for b in businesses if b['place_id'] not in classified]
+            self._log(f"Resuming: {len(classified)} already classified, {len(businesses)} remaining ({len(known_details)} with saved details)")
+        return businesses, known_details
+
+    def _stream_places(self, run_journal, resuming, location, business_type, max_results, tiled, place_filter, summary,
+                       cancel=None):
+        # Like _list_places, but returns a generator that runs on the details producer thread.
+        # Only place_ids (for deduplication and resume) are kept in memory.
+        known_details = None
+        classified = set()
+        replay = resuming and run_journal.search_complete
+        if resuming:
+            classified = run_journal.classified_ids()
+            known_details = run_journal.details_view()
+            self._log(f"Resuming: {len(classified)} already classified ({len(known_details)} with saved details)")
+
+        def places():
+            if replay:
+                source = (PlaceRecord.from_dict(b) for b in run_journal.iter_places())
+            elif tiled:
+                source = self.iter_businesses_tiled(location, business_type, max_results, cancel=cancel)
+            else:
+                source = self.iter_businesses_in_area(location, business_type, max_results, cancel=cancel)
+            if run_journal is not None and not replay:
+                run_journal.clear_places()
+            with self.events.stage("search") as stage:
+                chunk = []
+                for business in source:
+                    chunk.append(business)
+                    if len(chunk) < STREAM_CHUNK_SIZE:
+                        continue
+                    stage["items"] += len(chunk)
+                    yield from self._stream_chunk(chunk, run_journal, replay, place_filter, classified, summary)
+                    chunk = []
+                stage["items"] += len(chunk)
+                yield from self._stream_chunk(chunk, run_journal, replay, place_filter, classified, summary)
+            if cancel is not None and cancel.is_set():
+                return
+            if run_journal is not None and not replay:
+                run_journal.mark_search_complete()
+            if not summary['found']:
+                self._log("No businesses found. Try a different search term or location.")
+
+        return places(), known_details
+
+    def _stream_chunk(self, chunk, run_journal, replay, place_filter, classified, summary):
+        summary['found'] += len(chunk)
+        if run_journal is not None and not replay and chunk:
+            run_journal.append_places(chunk)
+        if place_filter is not None and chunk:
+            kept = place_filter(chunk)
+            summary['skipped'] += len(chunk) - len(kept)
+            chunk = kept
+        return [b for b in chunk if b['place_id'] not in classified]
+
+    def _run_count(self, name):
+        # A counter of the current run's metrics
+        return self.events.metrics.snapshot()['counters'].get(name, 0)
+
+    def _finish_delta(self, delta, summary, max_results):
+        # A cancelled, truncated (by max_results or the search cap) or partly failed sweep did not see the whole area, so nothing
+        # is flagged removed
+        search_errors = self._run_count("errors.search")
+        saturated = self._run_count("search.saturated")
+        if summary['cancelled']:
+            pass
+        elif search_errors:
+            self._log(f"[PLACES] {search_errors} searches failed; not checking for removed places")
+        elif saturated:
+            self._log(f"[PLACES] {saturated} searches hit the {NEARBY_SEARCH_CAP}-result cap; not checking for removed places")
+        elif summary['found'] >= max_results:
+            self._log(f"[PLACES] Search stopped at max_results={max_results}; not checking for removed places")
+        else:
+            delta.finish()
+        report = delta.report()
+        summary.update(added=len(report['added']), changed=len(report['changed']),
+                       removed=len(report['removed']), unchanged=report['unchanged'], delta=report)
+        self._log(f"[PLACES] Delta: {summary['added']} new, {summary['changed']} changed status, "
+                  f"{summary['removed']} removed, {summary['unchanged']} unchanged (skipped), {report['rechecked']} re-checked")
+        for entry in report['changed']:
+            self._log(f"[PLACES] Changed: {entry['name']} {entry['previous_status']} -> {entry['status']}")
+        for entry in report['removed']:
+            self._log(f"[PLACES] Removed: {entry['name'] or entry['place_id']}")
+
+    def _run_journaled(self, run_journal, resuming, location, business_type, max_results, batch_size, tiled, sinks,
+                       place_filter, cancel=None, stream=False, delta=None):
+        summary = {
+            'run_id': run_journal.run_id if run_journal is not None else None,
+            'location': location,
+            'business_type': business_type,
+            'found': 0,
+            'skipped': 0,
+            'analyzed': 0,
+            'decided_locally': 0,
+            'ai_batches': 0,
+            'no_website': 0,
+            'unanswered': 0,
+            'details_failed': 0,
+            'cancelled': False,
+        }
+        cancelled = cancel.is_set if cancel is not None else lambda: False
+        if delta is not None:
+            summary.update(added=0, changed=0, removed=0, unchanged=0)
+            user_filter = place_filter
+
+            def place_filter(businesses):
+                # Every place the search returned counts as still present, even if another filter drops it
+                delta.see(businesses)
+                return delta.filter(user_filter(businesses) if user_filter else businesses)
+        if run_journal is not None:
+            self._log(f"Run id: {run_journal.run_id} (continue an interrupted run with resume='{run_journal.run_id}')")
+        self._log("Starting Google Places business website checker (rules for obvious cases, AI for the rest, conservative)...")
+        self._log(f"Location: {location}")
+        self._log(f"Business type: {business_type or 'All businesses'}")
+        self._log(f"Batch size: up to {batch_size} businesses / ~{self.max_batch_tokens} tokens ({self.classify_workers} concurrent AI calls)")
+        self._log("-" * 60)
+        if stream:
+            businesses, known_details = self._stream_places(run_journal, resuming, location, business_type,
+                                                            max_results, tiled, place_filter, summary, cancel)
+        else:
+            businesses, known_details = self._list_places(run_journal, resuming, location, business_type,
+                                                          max_results, tiled, place_filter, summary, cancel)
+            if businesses is None:
+                return summary
+        if cancelled():
+            self._log("Run cancelled before fetching details.")
+            summary['cancelled'] = True
+            return summary
+        self._log("-" * 60)
+        self._log(f"Fetching details ({self.details_workers} workers) and classifying in batches as they fill...")
+        # Details are fetched on a producer thread; each full batch is classified here as soon
+        # as it is ready, with a bounded queue applying backpressure between the two stages.
+        batches = queue.Queue(maxsize=self.pipeline_depth)
+        stop = threading.Event()
+        producer = threading.Thread(target=self._produce_detail_batches,
+                                    args=(businesses, batch_size, batches, stop, run_journal, known_details), daemon=True)
+        for sink in sinks:
+            sink.open()
+        producer.start()
+        analyzed = 0
+        decided_locally = 0
+        batch_num = 0
+        # Up to classify_workers Gemini batches run at once, paced by the shared rate limiter.
+        # Workers pass each answer back as it streams in; results are recorded on this thread only.
+        classify_pool = ThreadPoolExecutor(max_workers=self.classify_workers)
+        answers = queue.Queue()
+        in_flight = {}
+
+        total = len(businesses) if not stream else None
+        committed = 0
+
+        def commit(results):
+            nonlocal committed
+            self._commit_results(sinks, run_journal, results)
+            if delta is not None and results:
+                delta.record(results)
+            committed += len(results)
+            self.events.progress("classify", committed, total)
+
+        def take(key, entry, results):
+            # Returns True when the answer marks the end of its batch
+            by_id, future = in_flight[key]
+            if entry is not None:
+                result = self._record_answer(by_id, entry)
+                if result is not None:
+                    results.append(result)
+                return False
+            del in_flight[key]
+            future.result()
+            # Records Gemini never answered (errors, exhausted retries) are left for a resume
+            summary['unanswered'] += len(by_id)
+            for business in by_id.values():
+                self._log(f"[PLACES][WARN] No AI classification returned for: {business['name']}")
+            return True
+
+        def collect(block):
+            # Records the answers that have arrived, committing them together; with block, keeps
+            # waiting until at least one in-flight batch has finished
+            while in_flight:
+                results = []
+                finished = False
+                try:
+                    key, entry = answers.get(timeout=0.2) if block else answers.get_nowait()
+                    while True:
+                        finished = take(key, entry, results) or finished
+                        key, entry = answers.get_nowait()
+                except queue.Empty:
+                    pass
+                if results:
+                    commit(results)
+                if finished or not block:
+                    return
+
+        try:
+            with self.events.stage("classify") as stage:
+                while True:
+                    collect(block=False)
+                    if cancelled():
+                        summary['cancelled'] = True
+                        self._log(f"Cancelling: finishing {len(in_flight)} AI batches already sent, skipping the rest...")
+                        break
+                    try:
+                        item = batches.get(timeout=0.2)
+                    except queue.Empty:
+                        continue
+                    if item is _PIPELINE_DONE:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    kind, batch = item
+                    analyzed += len(batch)
+                    if kind == "decided":
+                        decided_locally += len(batch)
+                        for business, classification in batch:
+                            self._record_classification(business, classification)
+                        commit(batch)
+                        continue
+                    while len(in_flight) >= self.classify_workers:
+                        collect(block=True)
+                    batch_num += 1
+                    self._log(f"AI Processing batch {batch_num} ({len(batch)} businesses)")
+                    in_flight[batch_num] = (self.prompt_builder.index_batch(batch),
+                                            classify_pool.submit(self._classify_into, batch_num, batch, answers))
+                while in_flight:
+                    collect(block=True)
+                stage["items"] = committed
+        finally:
+            stop.set()
+            producer.join()
+            classify_pool.shutdown(wait=True, cancel_futures=True)
+            for sink in sinks:
+                sink.close()
+        # Places whose details could not be fetched were never classified; like unanswered ones
+        # they are left for a resume
+        summary['details_failed'] = self._run_count("errors.details")
+        incomplete = summary['unanswered'] or summary['details_failed']
+        self._log("-" * 60)
+        if summary['cancelled']:
+            self._log("Analysis cancelled.")
+        elif incomplete:
+            self._log(f"Analysis incomplete: {summary['unanswered']} businesses got no AI answer, "
+                      f"{summary['details_failed']} got no Place Details.")
+        else:
+            self._log("Analysis complete!")
+        self._log(f"Total businesses analyzed: {analyzed - summary['unanswered']}")
+        self._log(f"Decided locally (rules, cache, local model): {decided_locally}, sent to AI: {analyzed - decided_locally} in {batch_num} batches")
+        self._log(f"Businesses without websites: {self.no_website_count}")
+        for namespace, counts in self.cache_stats().items():
+            self._log(f"[PLACES] Cache {namespace}: {counts['hits']} hits, {counts['misses']} misses")
+        limiter_stats = self.rate_limiter.stats()
+        self._log(f"[PLACES] Gemini rate limiter: {limiter_stats['throttled']} throttled, {limiter_stats['waited_seconds']}s waited")
+        for sink in sinks:
+            self._log(f"[PLACES] Results saved to {sink.path} ({sink.count} rows)")
+        if delta is not None:
+            self._finish_delta(delta, summary, max_results)
+        if run_journal is not None and not summary['cancelled'] and not incomplete:
+            run_journal.mark_complete()
+        elif run_journal is not None:
+            self._log(f"Continue this run later with resume='{run_journal.run_id}'")
+        summary.update(analyzed=analyzed - summary['unanswered'], decided_locally=decided_locally, ai_batches=batch_num, no_website=self.no_website_count)
+        return summary 
\ No newline at end of file
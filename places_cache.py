@@ -0,0 +1,117 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# On-disk key/value cache shared by every checker in the process (and by other processes
+# pointing at the same file). Entries live in namespaces ("geocode", "details", ...), carry
+# an optional expiry time and are evicted least-recently-used once max_entries is exceeded.
+
+DEFAULT_CACHE_PATH = "places_cache.sqlite3"
+
+
+class SQLiteCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=50000, evict_every=64):
+        self.path = path
+        self.max_entries = max_entries
+        self.evict_every = max(1, evict_every)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._hits = {}
+        self._misses = {}
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " namespace TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL,"
+                " accessed_at REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)")
+
+    def _conn(self):
+        # sqlite3 connections cannot be shared between threads, so each thread gets its own.
+        # WAL + busy_timeout lets readers and writers in other processes proceed concurrently.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, counter, namespace):
+        with self._lock:
+            counter[namespace] = counter.get(namespace, 0) + 1
+
+    def get(self, namespace, key, default=None):
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+            (namespace, key),
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= now):
+            self._count(self._misses, namespace)
+            return default
+        with conn:
+            conn.execute(
+                "UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, namespace, key),
+            )
+        self._count(self._hits, namespace)
+        return json.loads(row[0])
+
+    def set(self, namespace, key, value, ttl=None):
+        conn = self._conn()
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, json.dumps(value, separators=(",", ":")), expires_at, now),
+            )
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % self.evict_every == 0
+        if evict:
+            self.evict()
+
+    def delete(self, namespace, key):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def evict(self):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+            if self.max_entries:
+                count = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+                if count > self.max_entries:
+                    conn.execute(
+                        "DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache ORDER BY accessed_at LIMIT ?)",
+                        (count - self.max_entries,),
+                    )
+
+    def stats(self):
+        with self._lock:
+            namespaces = sorted(set(self._hits) | set(self._misses))
+            return {
+                ns: {"hits": self._hits.get(ns, 0), "misses": self._misses.get(ns, 0)}
+                for ns in namespaces
+            }
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
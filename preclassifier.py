@@ -0,0 +1,119 @@
+import re
+from urllib.parse import urlsplit
+
+# Deterministic rules applied before Gemini. They only decide the cases the Gemini prompt
+# already spells out (no links at all, or nothing but social/review/booking/Google pages);
+# anything else is left for the model.
+
+NO_WEBSITE = "NO_WEBSITE"
+HAS_WEBSITE = "HAS_WEBSITE"
+
+# Host suffixes that never count as an official website, with the label used in the reason
+THIRD_PARTY_HOSTS = {
+    "facebook.com": "Facebook",
+    "fb.com": "Facebook",
+    "fb.me": "Facebook",
+    "instagram.com": "Instagram",
+    "instagr.am": "Instagram",
+    "twitter.com": "Twitter/X",
+    "x.com": "Twitter/X",
+    "tiktok.com": "TikTok",
+    "youtube.com": "YouTube",
+    "linkedin.com": "LinkedIn",
+    "wa.me": "WhatsApp",
+    "whatsapp.com": "WhatsApp",
+    "linktr.ee": "Linktree",
+    "booking.com": "Booking.com",
+    "agoda.com": "Agoda",
+    "airbnb.com": "Airbnb",
+    "expedia.com": "Expedia",
+    "hotels.com": "Hotels.com",
+    "yelp.com": "Yelp",
+    "foursquare.com": "Foursquare",
+    "ubereats.com": "Uber Eats",
+    "sites.google.com": "Google Sites",
+    "business.site": "Google Business Profile",
+    "g.page": "Google Business Profile",
+    "maps.google.com": "Google Maps",
+    "maps.app.goo.gl": "Google Maps",
+    "goo.gl": "Google short link",
+}
+
+# Brands registered under many country TLDs (tripadvisor.com, tripadvisor.co.uk, ...)
+THIRD_PARTY_BRANDS = {
+    "tripadvisor": "TripAdvisor",
+    "yelp": "Yelp",
+}
+
+# Paths on otherwise-official hosts that are still Google pages
+THIRD_PARTY_PREFIXES = {
+    ("google.com", "/maps"): "Google Maps",
+    ("google.com", "/business"): "Google Business Profile",
+}
+
+
+def _suffix_pattern(suffixes):
+    alternatives = "|".join(re.escape(s) for s in sorted(suffixes, key=len, reverse=True))
+    return re.compile(rf"(?:^|\.)({alternatives})$")
+
+
+class RuleClassifier:
+    def __init__(self, third_party_hosts=None, third_party_brands=None):
+        self.third_party_hosts = dict(THIRD_PARTY_HOSTS if third_party_hosts is None else third_party_hosts)
+        self.third_party_brands = dict(THIRD_PARTY_BRANDS if third_party_brands is None else third_party_brands)
+        self._host_re = _suffix_pattern(self.third_party_hosts)
+        brands = "|".join(re.escape(b) for b in self.third_party_brands)
+        # brand.tld or brand.co.tld, optionally under a subdomain (www.tripadvisor.co.uk)
+        self._brand_re = re.compile(rf"(?:^|\.)({brands})\.(?:[a-z]{{2,3}}\.)?[a-z]{{2,}}$") if brands else None
+
+    def _host_and_path(self, url):
+        url = url.strip()
+        if "://" not in url:
+            url = "http://" + url
+        try:
+            parts = urlsplit(url)
+        except ValueError:
+            return "", ""
+        host = (parts.hostname or "").lower().rstrip(".")
+        if host.startswith("www."):
+            host = host[4:]
+        return host, parts.path or "/"
+
+    def third_party_label(self, url):
+        # The platform name if url points at a known non-official site, else None
+        host, path = self._host_and_path(url)
+        if not host:
+            return None
+        for (prefix_host, prefix_path), label in THIRD_PARTY_PREFIXES.items():
+            if host == prefix_host and path.startswith(prefix_path):
+                return label
+        match = self._host_re.search(host)
+        if match:
+            return self.third_party_hosts[match.group(1)]
+        if self._brand_re is not None:
+            match = self._brand_re.search(host)
+            if match:
+                return self.third_party_brands[match.group(1)]
+        return None
+
+    def classify(self, business):
+        # A classification dict shaped like Gemini's, or None when the record needs the model
+        urls = [link.get('url') for link in business.get('links') or [] if link and link.get('url')]
+        if not urls:
+            return self._result(business, NO_WEBSITE, "No links found.")
+        labels = []
+        for url in urls:
+            label = self.third_party_label(url)
+            if label is None:
+                return None
+            if label not in labels:
+                labels.append(label)
+        return self._result(business, NO_WEBSITE, f"Only third-party links ({', '.join(labels)}), not an official website.")
+
+    def _result(self, business, status, reason):
+        return {
+            'business_name': business.get('name'),
+            'status': status,
+            'reason': reason,
+            'source': 'rules',
+        }
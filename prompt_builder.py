@@ -0,0 +1,64 @@
+import json
+
+# Builds Gemini classification prompts. The instructions are a constant prefix; each business
+# is one compact JSON line tagged with a short ID ("b1", "b2", ...) that the model echoes
+# back, so results are joined to records by ID rather than by (possibly rewritten) name.
+
+PROMPT_PREFIX = (
+    "You are an expert at analyzing Google Maps business listings to determine if a business has an official website. "
+    "You will be given a list of businesses, one JSON object per line, each with an id, their name, any links found "
+    "(including the API 'website' field), phone numbers, and a text snippet.\n\n"
+    "A business HAS_WEBSITE if:\n"
+    "- There is a link to an official business website (not just social media, review sites, or third-party platforms)\n"
+    "- The website is clearly related to the business (not a generic, unrelated, or placeholder site)\n"
+    "- The link is not just to Facebook, Instagram, TripAdvisor, Booking.com, or similar\n"
+    "- The website is not a Google Maps, Google Sites, or Google Business Profile page\n"
+    "- If you are unsure, classify as NO_WEBSITE (be conservative)\n\n"
+    "A business has NO_WEBSITE if:\n"
+    "- There are only social media links (Facebook, Instagram, etc.)\n"
+    "- There are only phone numbers, addresses, or Google Maps links\n"
+    "- There are only third-party platforms like Yelp, TripAdvisor, Booking.com, etc.\n"
+    "- There is no clear website reference or domain link\n"
+    "- If you are unsure, classify as NO_WEBSITE\n\n"
+    "Here are the businesses to analyze:\n"
+)
+
+PROMPT_SUFFIX = (
+    "\nRespond with one entry per business, copying its id exactly, in this exact JSON format:\n"
+    '{"classifications": [{"id": "b1", "status": "HAS_WEBSITE", "reason": "Brief explanation"}, '
+    '{"id": "b2", "status": "NO_WEBSITE", "reason": "Brief explanation"}]}\n\n'
+    "Only include the JSON response, no other text."
+)
+
+SNIPPET_CHARS = 500
+
+
+def record_id(index):
+    # Stable short ID for the record at position index (0-based) within a batch
+    return f"b{index + 1}"
+
+
+def encode_record(rid, payload):
+    record = {"id": rid, "name": payload["name"]}
+    if payload["links"]:
+        record["links"] = payload["links"]
+    if payload["phones"]:
+        record["phones"] = payload["phones"]
+    if payload["text_snippet"]:
+        record["snippet"] = payload["text_snippet"]
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+
+
+class PromptBuilder:
+    def __init__(self, prefix=PROMPT_PREFIX, suffix=PROMPT_SUFFIX):
+        self.prefix = prefix
+        self.suffix = suffix
+        self.static_chars = len(prefix) + len(suffix)
+
+    def build(self, payloads):
+        # payloads: sanitized per-business dicts in batch order
+        lines = [encode_record(record_id(i), payload) for i, payload in enumerate(payloads)]
+        return "".join([self.prefix, "\n".join(lines), "\n", self.suffix])
+
+    def index_batch(self, batch):
+        return {record_id(i): business for i, business in enumerate(batch)}
@@ -0,0 +1,91 @@
+import threading
+import time
+
+# Token-bucket limiter for Gemini calls covering both requests/minute and tokens/minute.
+# One instance is shared by every classification worker (and every checker that is handed
+# it), so concurrent batches together stay inside the quota. After a 429 or a dropped
+# connection the effective rate is halved and all callers pause; successful calls then
+# restore the configured rate gradually.
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute=30, tokens_per_minute=1000000,
+                 min_backoff=2.0, max_backoff=60.0, min_rate_fraction=0.1, recovery_step=0.1):
+        self.requests_per_minute = float(requests_per_minute)
+        self.tokens_per_minute = float(tokens_per_minute)
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.min_rate_fraction = min_rate_fraction
+        self.recovery_step = recovery_step
+        self._lock = threading.Lock()
+        self._rate_fraction = 1.0
+        self._request_allowance = self.requests_per_minute
+        self._token_allowance = self.tokens_per_minute
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._backoff = min_backoff
+        self.throttled = 0
+        self.waited = 0.0
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        rate = self._rate_fraction / 60.0
+        self._request_allowance = min(self.requests_per_minute, self._request_allowance + elapsed * self.requests_per_minute * rate)
+        self._token_allowance = min(self.tokens_per_minute, self._token_allowance + elapsed * self.tokens_per_minute * rate)
+
+    def _delay(self, now, tokens):
+        if now < self._paused_until:
+            return self._paused_until - now
+        rate = self._rate_fraction / 60.0
+        delay = 0.0
+        if self._request_allowance < 1:
+            delay = max(delay, (1 - self._request_allowance) / (self.requests_per_minute * rate))
+        if self._token_allowance < tokens:
+            delay = max(delay, (tokens - self._token_allowance) / (self.tokens_per_minute * rate))
+        return delay
+
+    def acquire(self, tokens=0):
+        # Block until one request carrying `tokens` estimated tokens fits in both buckets
+        tokens = min(float(tokens), self.tokens_per_minute)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                delay = self._delay(now, tokens)
+                if delay <= 0:
+                    self._request_allowance -= 1
+                    self._token_allowance -= tokens
+                    return
+                # Sleeps are capped so a pause reported meanwhile is noticed; count only the time slept
+                delay = min(delay, 1.0)
+                self.waited += delay
+            time.sleep(delay)
+
+    def report_throttled(self):
+        # Called after a 429 / quota error or a dropped connection; returns the pause length
+        with self._lock:
+            self.throttled += 1
+            self._rate_fraction = max(self.min_rate_fraction, self._rate_fraction / 2)
+            pause = self._backoff
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            self._backoff = min(self.max_backoff, self._backoff * 2)
+            return pause
+
+    def report_success(self):
+        with self._lock:
+            self._rate_fraction = min(1.0, self._rate_fraction + self.recovery_step)
+            self._backoff = self.min_backoff
+
+    def stats(self):
+        with self._lock:
+            return {
+                "throttled": self.throttled,
+                "waited_seconds": round(self.waited, 2),
+                "rate_fraction": round(self._rate_fraction, 2),
+            }
+
+
+def estimate_tokens(text):
+    # Rough prompt-size estimate (about four characters per token) used for packing and limiting
+    return len(text) // 4 + 1
@@ -0,0 +1,55 @@
+# Compact place records. Search results and details records used to be plain dicts; a
+# __slots__ class holds the same fields in a fraction of the memory, which matters when a
+# streaming sweep has tens of thousands of places passing through. PlaceRecord keeps the
+# mapping interface the rest of the code uses (record['name'], record.get('links'),
+# dict(record)), so rules, sinks and the journal accept either a record or a dict.
+
+PLACE_FIELDS = ('name', 'place_id', 'vicinity', 'maps_url', 'links', 'phones', 'text_snippet', 'reason')
+
+
+class PlaceRecord:
+    __slots__ = PLACE_FIELDS
+
+    def __init__(self, name=None, place_id=None, vicinity=None, maps_url=None, links=None, phones=None,
+                 text_snippet=None, reason=None):
+        self.name = name
+        self.place_id = place_id
+        self.vicinity = vicinity
+        self.maps_url = maps_url
+        self.links = links
+        self.phones = phones
+        self.text_snippet = text_snippet
+        self.reason = reason
+
+    @classmethod
+    def from_dict(cls, data):
+        if isinstance(data, cls):
+            return data
+        return cls(**{k: data.get(k) for k in PLACE_FIELDS})
+
+    def keys(self):
+        # Only the fields that are set, so dict(record) matches the dicts these records replace
+        return [k for k in PLACE_FIELDS if getattr(self, k) is not None]
+
+    def __getitem__(self, key):
+        if key not in PLACE_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in PLACE_FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in PLACE_FIELDS and getattr(self, key) is not None
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None) if key in PLACE_FIELDS else None
+        return default if value is None else value
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.keys()}
+
+    def __repr__(self):
+        return f"PlaceRecord({self.to_dict()!r})"
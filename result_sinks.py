@@ -0,0 +1,149 @@
+import csv
+import json
+import os
+
+# Streaming result writers. run_search hands each sink the (business, classification) pairs
+# of every finished batch; sinks append them and flush immediately, so partial results are
+# on disk while a run is still going and nothing has to be held until the end.
+
+DEFAULT_BASENAME = "places_businesses_without_websites"
+
+
+class ResultSink:
+    extension = ""
+
+    def __init__(self, path, include_has_website=False, append=False):
+        self.path = path
+        self.include_has_website = include_has_website
+        self.append = append
+        self.count = 0
+        self._file = None
+
+    def open(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        resuming = self.append and os.path.exists(self.path) and os.path.getsize(self.path) > 0
+        self._file = open(self.path, 'a' if self.append else 'w', newline='', encoding='utf-8')
+        if resuming:
+            self.count = self._existing_rows()
+        else:
+            self._write_header()
+            self._file.flush()
+        return self
+
+    def _existing_rows(self):
+        return 0
+
+    def _write_header(self):
+        pass
+
+    def _write_row(self, business, classification):
+        raise NotImplementedError
+
+    def write_batch(self, results):
+        if self._file is None:
+            self.open()
+        written = 0
+        for business, classification in results:
+            if classification['status'] != 'NO_WEBSITE' and not self.include_has_website:
+                continue
+            self.count += 1
+            self._write_row(business, classification)
+            written += 1
+        if written:
+            self._file.flush()
+        return written
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TextSink(ResultSink):
+    extension = ".txt"
+
+    def _existing_rows(self):
+        with open(self.path, encoding='utf-8') as f:
+            return sum(1 for line in f if line[:1].isdigit())
+
+    def _write_header(self):
+        self._file.write("Businesses Without Websites (Classified by AI, Places API)\n")
+        self._file.write("=" * 60 + "\n\n")
+
+    def _write_row(self, business, classification):
+        f = self._file
+        status = "" if not self.include_has_website else f" [{classification['status']}]"
+        f.write(f"{self.count}. {business['name']}{status}\n")
+        f.write(f"   Google Maps: {business['maps_url']}\n")
+        if classification.get('reason'):
+            f.write(f"   AI Analysis: {classification['reason']}\n")
+        f.write("\n")
+
+
+class CsvSink(ResultSink):
+    extension = ".csv"
+
+    def _existing_rows(self):
+        with open(self.path, newline='', encoding='utf-8') as f:
+            return max(0, sum(1 for _ in csv.reader(f)) - 1)
+
+    def open(self):
+        super().open()
+        self._writer = csv.writer(self._file)
+        return self
+
+    def _write_header(self):
+        header = ['Business Name', 'Google Maps URL', 'AI Analysis']
+        if self.include_has_website:
+            header.append('Status')
+        csv.writer(self._file).writerow(header)
+
+    def _write_row(self, business, classification):
+        row = [
+            business['name'],
+            business['maps_url'],
+            classification.get('reason') or 'No analysis available',
+        ]
+        if self.include_has_website:
+            row.append(classification['status'])
+        self._writer.writerow(row)
+
+
+class JsonlSink(ResultSink):
+    extension = ".jsonl"
+
+    def _existing_rows(self):
+        with open(self.path, encoding='utf-8') as f:
+            return sum(1 for line in f if line.strip())
+
+    def _write_row(self, business, classification):
+        row = {
+            'name': business['name'],
+            'maps_url': business['maps_url'],
+            'status': classification['status'],
+            'reason': classification.get('reason', ''),
+            'source': classification.get('source', 'ai'),
+        }
+        self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+SINK_TYPES = {
+    'txt': TextSink,
+    'csv': CsvSink,
+    'jsonl': JsonlSink,
+}
+
+
+def make_sinks(formats=('txt', 'csv'), basename=DEFAULT_BASENAME, include_has_website=False, append=False):
+    sinks = []
+    for fmt in formats:
+        sink_type = SINK_TYPES[fmt]
+        sinks.append(sink_type(basename + sink_type.extension, include_has_website=include_has_website, append=append))
+    return sinks
@@ -0,0 +1,187 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+# Per-run checkpoint journal. A sweep records its run parameters, the places discovered by
+# the search, every fetched details record and every committed classification in
+# runs/<run_id>.sqlite3, so run_search(resume=<run_id>) can pick up after a crash or quota
+# stop without repeating search pages, details calls or Gemini batches.
+
+DEFAULT_RUN_DIR = "runs"
+
+
+def new_run_id():
+    return time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+
+
+class RunJournal:
+    def __init__(self, path, run_id):
+        self.path = path
+        self.run_id = run_id
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS places (seq INTEGER PRIMARY KEY, place_id TEXT NOT NULL, business TEXT NOT NULL)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS details (place_id TEXT PRIMARY KEY, record TEXT NOT NULL)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS classifications (place_id TEXT PRIMARY KEY, classification TEXT NOT NULL, committed_at REAL NOT NULL)")
+
+    @classmethod
+    def create(cls, params, run_dir=DEFAULT_RUN_DIR, run_id=None):
+        os.makedirs(run_dir, exist_ok=True)
+        run_id = run_id or new_run_id()
+        journal = cls(os.path.join(run_dir, f"{run_id}.sqlite3"), run_id)
+        journal._set_meta("params", params)
+        journal._set_meta("status", "running")
+        return journal
+
+    @classmethod
+    def open(cls, run_id, run_dir=DEFAULT_RUN_DIR):
+        path = os.path.join(run_dir, f"{run_id}.sqlite3")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No run journal for run id {run_id!r} in {run_dir}")
+        return cls(path, run_id)
+
+    def _set_meta(self, key, value):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def _get_meta(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    @property
+    def params(self):
+        return self._get_meta("params", {})
+
+    @property
+    def status(self):
+        return self._get_meta("status")
+
+    def record_places(self, businesses):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM places")
+            self._conn.executemany(
+                "INSERT INTO places (seq, place_id, business) VALUES (?, ?, ?)",
+                [(i, b['place_id'], json.dumps(dict(b))) for i, b in enumerate(businesses)],
+            )
+        self._set_meta("search_complete", True)
+
+    # Streaming runs record places in chunks as the search finds them: clear_places() first,
+    # append_places() per chunk, then mark_search_complete() once the search is exhausted.
+    def clear_places(self):
+        self._set_meta("search_complete", False)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM places")
+
+    def append_places(self, businesses):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO places (place_id, business) VALUES (?, ?)",
+                [(b['place_id'], json.dumps(dict(b))) for b in businesses],
+            )
+
+    def mark_search_complete(self):
+        self._set_meta("search_complete", True)
+
+    @property
+    def search_complete(self):
+        return self._get_meta("search_complete", False)
+
+    def places(self):
+        # The discovered businesses in search order, or None if the search never finished
+        if not self.search_complete:
+            return None
+        with self._lock:
+            rows = self._conn.execute("SELECT business FROM places ORDER BY seq").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def iter_places(self, chunk_size=500):
+        # Like places(), but reads the table in chunks instead of loading it at once
+        last_seq = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute("SELECT seq, business FROM places WHERE seq > ? ORDER BY seq LIMIT ?",
+                                          (last_seq, chunk_size)).fetchall()
+            if not rows:
+                return
+            for seq, business in rows:
+                yield json.loads(business)
+            last_seq = rows[-1][0]
+
+    def record_details(self, place_id, record):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO details (place_id, record) VALUES (?, ?)", (place_id, json.dumps(dict(record))))
+
+    def details(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT place_id, record FROM details").fetchall()
+        return {place_id: json.loads(record) for place_id, record in rows}
+
+    def details_view(self):
+        # A read-only place_id -> record mapping backed by the journal, for streaming resumes
+        return _DetailsView(self)
+
+    def _details_for(self, place_id):
+        with self._lock:
+            row = self._conn.execute("SELECT record FROM details WHERE place_id = ?", (place_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _details_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM details").fetchone()[0]
+
+    def record_classifications(self, results):
+        # Commits one finished batch of (business, classification) pairs atomically
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO classifications (place_id, classification, committed_at) VALUES (?, ?, ?)",
+                [(business['place_id'], json.dumps(classification), now) for business, classification in results],
+            )
+
+    def decisions(self):
+        # (details record, classification) pairs for every committed place with saved details
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT d.record, c.classification FROM classifications c JOIN details d USING (place_id)"
+                " ORDER BY c.committed_at").fetchall()
+        return [(json.loads(record), json.loads(classification)) for record, classification in rows]
+
+    def classified_ids(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT place_id FROM classifications").fetchall()
+        return {row[0] for row in rows}
+
+    def mark_complete(self):
+        self._set_meta("status", "complete")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _DetailsView:
+    def __init__(self, journal):
+        self._journal = journal
+
+    def get(self, place_id, default=None):
+        record = self._journal._details_for(place_id)
+        return default if record is None else record
+
+    def __contains__(self, place_id):
+        return self._journal._details_for(place_id) is not None
+
+    def __getitem__(self, place_id):
+        record = self._journal._details_for(place_id)
+        if record is None:
+            raise KeyError(place_id)
+        return record
+
+    def __len__(self):
+        return self._journal._details_count()
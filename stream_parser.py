@@ -0,0 +1,89 @@
+import json
+import re
+
+# Incremental parser for Gemini's streamed {"classifications": [...]} responses. Text is fed
+# chunk by chunk and every array entry is returned as soon as its closing brace arrives, so
+# a truncated or partly malformed response still yields the entries that were complete.
+
+_ARRAY_START = re.compile(r'"classifications"\s*:\s*\[')
+
+
+class ClassificationStreamParser:
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._in_array = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._entry_start = None
+        self.complete = False
+        self.errors = []
+
+    def _find_array(self):
+        match = _ARRAY_START.search(self._buffer, self._pos)
+        if match:
+            self._pos = match.end()
+            return True
+        # Also accept a bare top-level array
+        stripped = self._buffer.lstrip()
+        if stripped.startswith("["):
+            self._pos = len(self._buffer) - len(stripped) + 1
+            return True
+        return False
+
+    def feed(self, text):
+        # Returns the entries completed by this chunk, in order
+        self._buffer += text
+        entries = []
+        if self.complete:
+            return entries
+        if not self._in_array:
+            if not self._find_array():
+                return entries
+            self._in_array = True
+        buf = self._buffer
+        pos = self._pos
+        while pos < len(buf):
+            ch = buf[pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._entry_start = pos
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0 and self._entry_start is not None:
+                    raw = buf[self._entry_start:pos + 1]
+                    self._entry_start = None
+                    try:
+                        entry = json.loads(raw)
+                    except json.JSONDecodeError as e:
+                        self.errors.append(f"{e}: {raw[:200]}")
+                    else:
+                        if isinstance(entry, dict):
+                            entries.append(entry)
+                elif self._depth < 0:
+                    self._depth = 0
+            elif ch == "]" and self._depth == 0:
+                self.complete = True
+                pos += 1
+                break
+            pos += 1
+        self._pos = pos
+        # Drop text that can no longer be part of an unfinished entry
+        keep_from = self._entry_start if self._entry_start is not None else pos
+        if keep_from > 0:
+            self._buffer = buf[keep_from:]
+            self._pos -= keep_from
+            if self._entry_start is not None:
+                self._entry_start = 0
+        return entries